@@ -0,0 +1,267 @@
+import numpy as np
+
+SHUTTERS = ('global', 'rolling')
+
+# Sensor rows simulated when the same signal reaches the whole sensor
+SENSOR_ROWS = 64
+
+
+def frame_timing(num_frames, frame_rate, exposure, readout_time=0.0, num_rows=1, shutter='global',
+                 jitter_std=0.0, t0=0.0, rng=None):
+    """
+    Exposure windows of every frame (and every sensor row) of a camera
+
+    With a global shutter all rows are exposed at the same time and read out
+    afterwards. With a rolling shutter the rows start one after another,
+    spread over the readout time, so each row sees a slightly later moment.
+
+    Args:
+        num_frames: Number of frames
+        frame_rate: Frames per second
+        exposure: Exposure time per frame in seconds
+        readout_time: Time to read out all rows in seconds
+        num_rows: Number of sensor rows to simulate
+        shutter: 'global' or 'rolling'
+        jitter_std: Standard deviation of the frame trigger timing in seconds
+        t0: Start of the first frame
+        rng: np.random.Generator for the jitter
+
+    Returns:
+        Tuple of (start, stop) exposure times, each of shape (frames, rows)
+    """
+    if shutter not in SHUTTERS:
+        raise ValueError(f"shutter must be one of {SHUTTERS}, not {shutter!r}")
+    if exposure > 1 / frame_rate:
+        raise ValueError(f"exposure of {exposure} s does not fit in a frame at {frame_rate} fps")
+
+    start = t0 + np.arange(num_frames, dtype=float) / frame_rate
+    if jitter_std > 0:
+        rng = np.random.default_rng() if rng is None else rng
+        start = start + rng.normal(0, jitter_std, num_frames)
+
+    start = np.repeat(start[:, np.newaxis], num_rows, axis=1)
+    if shutter == 'rolling':
+        start += np.arange(num_rows) * (readout_time / num_rows)
+    return start, start + exposure
+
+
+def exposure_mask(t, start, stop):
+    """
+    Whether each time point falls inside an exposure window (vectorized)
+
+    Args:
+        t: Time points
+        start, stop: 1D arrays of sorted, non-overlapping exposure windows
+
+    Returns:
+        Boolean array of the same shape as t
+    """
+    start, stop = np.ravel(start), np.ravel(stop)
+    index = np.searchsorted(start, t, side='right') - 1
+    return (index >= 0) & (np.asarray(t) < stop[np.maximum(index, 0)])
+
+
+def cumulative_integral(signal, fs):
+    """
+    Running integral of a sampled signal (sample-and-hold between samples)
+
+    Returns:
+        Array with one more sample than signal along the first axis;
+        entry k is the integral from t = 0 to t = k / fs
+    """
+    signal = np.asarray(signal, dtype=float)
+    integral = np.zeros((signal.shape[0] + 1,) + signal.shape[1:])
+    np.cumsum(signal, axis=0, out=integral[1:])
+    integral /= fs
+    return integral
+
+
+def integral_at(integral, fs, times):
+    """
+    Evaluate a cumulative integral at arbitrary times (exact for sample-and-hold)
+
+    Args:
+        integral: Output of cumulative_integral, shape (samples + 1, rows, ...)
+            or (samples + 1,)
+        fs: Sampling rate
+        times: Times of shape (frames, rows); clipped to the recording
+
+    Returns:
+        Array of shape (frames, rows, ...) (or times.shape for a 1D signal)
+    """
+    position = np.clip(np.asarray(times, dtype=float) * fs, 0, integral.shape[0] - 1)
+    index = np.minimum(position.astype(np.int64), integral.shape[0] - 2)
+    fraction = position - index
+
+    if integral.ndim == 1:
+        low, high = integral[index], integral[index + 1]
+    else:
+        # Row r of every frame reads row r of the signal
+        extra = (1,) * (integral.ndim - 2)
+        index = index.reshape(index.shape + extra)
+        fraction = fraction.reshape(fraction.shape + extra)
+        low = np.take_along_axis(integral, index, axis=0)
+        high = np.take_along_axis(integral, index + 1, axis=0)
+    return low + fraction * (high - low)
+
+
+def integrate_windows(signal, fs, start, stop):
+    """
+    Mean of a fast signal over every exposure window, via cumulative sums
+
+    Cost is one pass over the signal plus O(1) per window, however long the
+    exposures are.
+
+    Args:
+        signal: Signal sampled at fs, shape (samples,) or (samples, rows, ...)
+            where row r is only seen by sensor row r
+        fs: Sampling rate of the signal
+        start, stop: Exposure windows of shape (frames, rows)
+
+    Returns:
+        Tuple of (mean value, standard deviation within the window), each of
+        shape (frames, rows, ...)
+    """
+    signal = np.asarray(signal, dtype=float)
+    duration = np.asarray(stop) - np.asarray(start)
+    duration = duration.reshape(duration.shape + (1,) * max(signal.ndim - 2, 0))
+
+    integral = cumulative_integral(signal, fs)
+    mean = (integral_at(integral, fs, stop) - integral_at(integral, fs, start)) / duration
+    integral = cumulative_integral(signal**2, fs)
+    mean_square = (integral_at(integral, fs, stop) - integral_at(integral, fs, start)) / duration
+    return mean, np.sqrt(np.maximum(mean_square - mean**2, 0))
+
+
+def motion_blur(position, fs, start, stop):
+    """
+    Distance an object travels during every exposure (the length of its motion blur)
+
+    Args:
+        position: Positions sampled at fs, shape (samples,) or (samples, dims)
+        fs: Sampling rate of the positions
+        start, stop: Exposure windows of shape (frames, rows)
+
+    Returns:
+        Path length per frame and row, in the units of position
+    """
+    position = np.asarray(position, dtype=float)
+    step = np.diff(position, axis=0)
+    speed = np.abs(step) if position.ndim == 1 else np.linalg.norm(step, axis=1)
+    speed = np.append(speed, speed[-1:]) * fs
+    integral = cumulative_integral(speed, fs)
+    return integral_at(integral, fs, stop) - integral_at(integral, fs, start)
+
+
+def simulate_acquisition(signal, fs, frame_rate, exposure, readout_time=0.0, shutter='global',
+                         jitter_std=0.0, position=None, num_frames=None, num_rows=None, rng=None):
+    """
+    Simulate a camera recording a fast signal
+
+    Args:
+        signal: Light reaching the sensor, sampled at fs; shape (samples,) or
+            (samples, rows, ...) for a scene that differs between sensor rows
+        fs: Sampling rate of signal (and position)
+        frame_rate, exposure, readout_time, shutter, jitter_std: Camera
+            settings (see frame_timing)
+        position: Optional positions of a moving object, (samples[, dims])
+        num_frames: Number of frames (default: as many as fit in the signal)
+        num_rows: Number of sensor rows (default: the rows of signal); a 1D
+            signal is seen by every row, each at its own time
+        rng: np.random.Generator for the jitter
+
+    Returns:
+        Dictionary with 'start'/'stop' (exposure windows), 'values' (per-frame
+        signal), 'smear' (signal change within an exposure, as a standard
+        deviation), 'blur' (path length, if position is given), 'duty_cycle'
+        (fraction of time the sensor collects light), 'frame_span' (first row
+        start to last row end) and 'max_frame_rate' for this exposure
+    """
+    signal = np.asarray(signal)
+    duration = signal.shape[0] / fs
+    if num_frames is None:
+        # Frames whose exposure (including the rolling readout) ends inside the signal
+        span = exposure + (readout_time if shutter == 'rolling' else 0.0)
+        num_frames = int(np.floor((duration - span) * frame_rate)) + 1
+    if signal.ndim > 1:
+        if num_rows not in (None, signal.shape[1]):
+            raise ValueError(f"num_rows={num_rows} does not match the {signal.shape[1]} rows of the signal")
+        num_rows = signal.shape[1]
+    elif num_rows is None:
+        num_rows = 1
+    if shutter == 'rolling' and num_rows < 2:
+        raise ValueError("a rolling shutter needs several rows: pass num_rows or a (samples, rows) signal")
+
+    start, stop = frame_timing(num_frames, frame_rate, exposure, readout_time, num_rows, shutter,
+                               jitter_std, rng=rng)
+    values, smear = integrate_windows(signal, fs, start, stop)
+
+    if shutter == 'rolling':
+        # Rows overlap in time: the next frame can start once the first row is read
+        frame_span = exposure + readout_time
+        max_frame_rate = 1 / max(exposure, readout_time)
+    else:
+        # Every row is read out after the shared exposure
+        frame_span = exposure
+        max_frame_rate = 1 / (exposure + readout_time)
+
+    result = {
+        'start': start,
+        'stop': stop,
+        'values': values,
+        'smear': smear,
+        'duty_cycle': exposure * frame_rate,
+        'frame_span': frame_span,
+        'max_frame_rate': max_frame_rate,
+    }
+    if position is not None:
+        result['blur'] = motion_blur(position, fs, start, stop)
+    return result
+
+
+def main():
+    fs = 10_000
+    rng = np.random.default_rng(0)
+    t = np.arange(0, 60, 1 / fs)
+
+    # Calcium transients: fast rise (50 ms), slow decay (0.5 s) at random spike times
+    spikes = np.zeros_like(t)
+    spikes[rng.choice(t.size, 40, replace=False)] = 1
+    kernel_t = np.arange(0, 3, 1 / fs)
+    kernel = (1 - np.exp(-kernel_t / 0.05)) * np.exp(-kernel_t / 0.5)
+    calcium = np.convolve(spikes, kernel)[:t.size] + 0.1
+
+    # Animal in an open field: smoothed random walk, in pixels
+    velocity = np.cumsum(rng.normal(0, 1, (t.size, 2)), axis=0)
+    position = np.cumsum(velocity - velocity.mean(axis=0), axis=0) / fs * 5
+
+    true_peak = calcium.max()
+    print('fps  exposure  shutter  duty   peak kept  smear   blur (px, 95th pct)')
+    for frame_rate in (10, 30, 100):
+        for fraction in (0.25, 0.9):
+            for shutter in SHUTTERS:
+                exposure = fraction / frame_rate
+                result = simulate_acquisition(calcium, fs, frame_rate, exposure, readout_time=0.005,
+                                              shutter=shutter, jitter_std=1e-4, position=position,
+                                              num_rows=SENSOR_ROWS, rng=rng)
+                print(f'{frame_rate:3d}  {exposure * 1000:6.1f} ms  {shutter:7s}  '
+                      f'{result["duty_cycle"]:4.2f}  {result["values"].max() / true_peak:8.1%}  '
+                      f'{result["smear"].mean():.4f}  {np.percentile(result["blur"], 95):6.2f}')
+
+    # Rolling shutter skew: a vertical bar sweeping across a small 2D scene at 400 px/s
+    scene_fs, rows, cols = 5000, 32, 64
+    scene_t = np.arange(0, 0.1, 1 / scene_fs)
+    x = np.arange(cols)
+    bar = np.exp(-0.5 * ((x - (10 + 400 * scene_t[:, np.newaxis])) / 1.5)**2)
+    scene = np.repeat(bar[:, np.newaxis, :], rows, axis=1)
+    print('\nbar crossing a 32-row sensor, 2 ms exposure, 20 ms readout:')
+    for shutter in SHUTTERS:
+        frame = simulate_acquisition(scene, scene_fs, 30, 0.002, readout_time=0.02, shutter=shutter)['values'][0]
+        # Bar position seen by every row (intensity centroid)
+        seen = (frame * x).sum(axis=1) / frame.sum(axis=1)
+        print(f'{shutter:7s} bar at x = {seen[0]:5.1f} px in the first row, {seen[-1]:5.1f} px in the last '
+              f'({seen[-1] - seen[0]:.1f} px skew)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import numpy as np
+
+# Largest bit depth we can store in our integer outputs (uint16)
+MAX_BIT_DEPTH = 16
+
+
+def code_dtype(bit_depth):
+    """
+    Pick the smallest unsigned integer type that can hold ADC codes
+
+    Args:
+        bit_depth: Number of bits (scalar or array, the maximum is used)
+
+    Returns:
+        np.uint8 for up to 8 bits, np.uint16 for up to 16 bits
+    """
+    max_bits = int(np.max(bit_depth))
+    if max_bits < 1 or max_bits > MAX_BIT_DEPTH:
+        raise ValueError(f"bit_depth must be between 1 and {MAX_BIT_DEPTH}, got {max_bits}")
+    return np.uint8 if max_bits <= 8 else np.uint16
+
+
+def split_range(input_range):
+    """
+    Split an input range into its (min, max) parts
+
+    Args:
+        input_range: Tuple of (min, max), or an array whose last axis has length 2
+
+    Returns:
+        Tuple of (min array, max array)
+    """
+    input_range = np.asarray(input_range, dtype=float)
+    if input_range.shape[-1:] != (2,):
+        raise ValueError("input_range must have (min, max) along its last axis")
+    return input_range[..., 0], input_range[..., 1]
+
+
+class LevelCounter:
+    """
+    Incremental histogram of ADC codes over the known 2**bit_depth code space
+
+    Counting occupied bins of the code space replaces len(np.unique(...)), which
+    sorts the whole signal. Memory depends only on the bit depth, and counters
+    can be updated chunk by chunk or merged across workers.
+
+    Args:
+        bit_depth: Number of bits of the ADC codes
+        shape: Leading (non-sample) shape of the signals being counted
+    """
+
+    # Samples converted to bincount indices at once (bounds temporary memory)
+    block_size = 2**20
+
+    def __init__(self, bit_depth, shape=()):
+        self.bit_depth = int(bit_depth)
+        self.num_levels = 2**self.bit_depth
+        self.counts = np.zeros(tuple(shape) + (self.num_levels,), dtype=np.int64)
+
+    def update(self, codes):
+        """
+        Add a chunk of integer codes (samples along the last axis)
+
+        Returns:
+            The counter itself, so calls can be chained
+        """
+        codes = np.asarray(codes)
+        if codes.shape[:-1] != self.counts.shape[:-1]:
+            raise ValueError(f"codes have shape {codes.shape}, expected "
+                             f"{self.counts.shape[:-1]} leading axes")
+
+        histograms = self.counts.reshape(-1, self.num_levels)
+        for histogram, row in zip(histograms, codes.reshape(-1, codes.shape[-1])):
+            for start in range(0, row.size, self.block_size):
+                block_counts = np.bincount(row[start:start + self.block_size],
+                                           minlength=self.num_levels)
+                if block_counts.size > self.num_levels:
+                    raise ValueError(f"code {block_counts.size - 1} does not fit in "
+                                     f"{self.bit_depth} bits")
+                histogram += block_counts
+        return self
+
+    def merge(self, other):
+        """
+        Add the counts of another counter with the same bit depth and shape
+
+        Returns:
+            The counter itself, so calls can be chained
+        """
+        if other.bit_depth != self.bit_depth or other.counts.shape != self.counts.shape:
+            raise ValueError("can only merge counters with the same bit depth and shape")
+        self.counts += other.counts
+        return self
+
+    @property
+    def histogram(self):
+        """Number of samples at every code (occupancy histogram)"""
+        return self.counts
+
+    @property
+    def used_levels(self):
+        """Number of distinct codes that occurred"""
+        return np.count_nonzero(self.counts, axis=-1)
+
+    @property
+    def effective_bits(self):
+        """Bits needed to address the levels actually used (log2 of used levels)"""
+        return np.log2(np.maximum(self.used_levels, 1))
+
+    @property
+    def entropy_bits(self):
+        """Shannon entropy of the code distribution, in bits per sample"""
+        total = self.counts.sum(axis=-1, keepdims=True)
+        p = self.counts / np.maximum(total, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return -np.sum(np.where(p > 0, p * np.log2(p), 0.0), axis=-1)
+
+
+def count_used_levels(codes, bit_depth):
+    """
+    Count how many distinct ADC codes each signal uses
+
+    Signals shorter than the code space (typical in parameter sweeps) are
+    sorted in one vectorized call, which is cheaper than a 2**bit_depth
+    histogram per signal. Longer signals are histogrammed one at a time, so
+    memory never exceeds a single histogram.
+
+    Args:
+        codes: Integer codes with samples along the last axis
+        bit_depth: Number of bits of the codes
+
+    Returns:
+        Array with the number of used levels for every signal (leading axes of codes)
+    """
+    rows = codes.reshape(-1, codes.shape[-1])
+    if rows.shape[1] == 0:
+        used = np.zeros(rows.shape[0], dtype=np.int64)
+    elif rows.shape[1] < 2**int(bit_depth):
+        ordered = np.sort(rows, axis=-1)
+        used = 1 + np.count_nonzero(np.diff(ordered, axis=-1), axis=-1)
+    else:
+        used = np.array([LevelCounter(bit_depth).update(row).used_levels for row in rows])
+    return used.reshape(codes.shape[:-1])
+
+
+def quantize_codes(signal, bit_depth, input_range=None, gain=1.0, offset=0.0, out=None):
+    """
+    Convert a batch of analog signals to integer ADC codes in one broadcasted pass
+
+    The analog value seen by the ADC is signal * gain + offset. It is clipped to
+    the input range (saturation), mapped onto 2**bit_depth levels and rounded.
+    bit_depth, gain, offset and input_range may be arrays: they broadcast against
+    the leading (non-sample) axes of signal, so a whole parameter grid, or
+    every channel of a probe with its own settings, is evaluated at once (see
+    quantize_grid and quantize_channels). The work buffers follow the memory
+    order of signal, so a Fortran-ordered (channels, samples) view of an
+    interleaved recording is processed without a transpose.
+
+    Args:
+        signal: Analog signal(s), samples along the last axis
+        bit_depth: Number of bits to use for quantization
+        input_range: Tuple of (min, max) representing ADC input range, or an array
+            of ranges with (min, max) on the last axis. If None, the range of each
+            amplified signal is used (full-scale normalization)
+        gain: Amplification applied before the ADC
+        offset: Constant added after amplification
+        out: Optional preallocated uint8/uint16 array for the codes
+
+    Returns:
+        Tuple of (integer codes, saturated mask)
+    """
+    signal = np.asarray(signal)
+    bit_depth = np.asarray(bit_depth)
+    gain = np.asarray(gain, dtype=float)
+    offset = np.asarray(offset, dtype=float)
+
+    if input_range is None:
+        # Use the range of each amplified signal, like a perfectly tuned ADC
+        low = np.min(signal, axis=-1) * gain + offset
+        high = np.max(signal, axis=-1) * gain + offset
+        min_range, max_range = np.minimum(low, high), np.maximum(low, high)
+    else:
+        min_range, max_range = split_range(input_range)
+
+    # Per-signal parameters, broadcast over the leading axes
+    top = (2**bit_depth - 1).astype(float)
+    scale = gain * top / (max_range - min_range)
+    shift = (min_range - offset) * top / (max_range - min_range)
+    scale, shift, top = (p[..., np.newaxis] for p in (scale, shift, top))
+
+    out_shape = np.broadcast_shapes(signal.shape, scale.shape, shift.shape, top.shape)
+    order = 'F' if signal.flags.f_contiguous and not signal.flags.c_contiguous else 'C'
+    if out is None:
+        out = np.empty(out_shape, dtype=code_dtype(bit_depth), order=order)
+    elif out.shape != out_shape:
+        raise ValueError(f"out has shape {out.shape}, expected {out_shape}")
+
+    # Single float work buffer: map the input range onto [0, levels - 1]
+    work = np.multiply(signal, scale, out=np.empty(out_shape, order=order))
+    np.subtract(work, shift, out=work)
+
+    # Samples outside the input range are saturated
+    if input_range is None:
+        # Full-scale normalization cannot saturate, ignore rounding at the edges
+        saturated = np.zeros(out_shape, dtype=bool)
+    else:
+        saturated = work < 0
+        saturated |= work > top
+
+    # Clip, round to the nearest level and store as integer codes
+    np.clip(work, 0, top, out=work)
+    np.rint(work, out=work)
+    np.copyto(out, work, casting='unsafe')
+
+    return out, saturated
+
+
+def quantize(signal, bit_depth, input_range=None, gain=1.0, offset=0.0, out=None):
+    """
+    Convert a batch of analog signals to integer ADC codes and count used levels
+
+    Same as quantize_codes, but also reports how many distinct levels each
+    signal occupies.
+
+    Args:
+        signal: Analog signal(s), samples along the last axis
+        bit_depth: Number of bits to use for quantization
+        input_range: Tuple of (min, max) representing ADC input range, or None
+        gain: Amplification applied before the ADC
+        offset: Constant added after amplification
+        out: Optional preallocated uint8/uint16 array for the codes
+
+    Returns:
+        Tuple of (integer codes, saturated mask, used levels per signal)
+    """
+    codes, saturated = quantize_codes(signal, bit_depth, input_range, gain, offset, out)
+    used_levels = count_used_levels(codes, np.max(bit_depth))
+
+    return codes, saturated, used_levels
+
+
+def quantize_channels(signal, bit_depth, input_range, gain=1.0, offset=0.0, out=None):
+    """
+    Quantize a multi-channel block where every channel has its own ADC settings
+
+    Args:
+        signal: Analog block of shape (channels, samples), C or F order
+        bit_depth: Bits per channel (scalar or one per channel)
+        input_range: Tuple of (min, max), or array of shape (channels, 2)
+        gain: Amplification per channel (scalar or one per channel)
+        offset: Offset per channel (scalar or one per channel)
+        out: Optional preallocated array for the codes
+
+    Returns:
+        Tuple of (codes, saturated fraction per channel, used levels per channel)
+    """
+    signal = np.asarray(signal)
+    if signal.ndim != 2:
+        raise ValueError(f"expected a (channels, samples) block, got shape {signal.shape}")
+
+    # One value per channel (quantize_codes broadcasts them along the samples)
+    num_channels = signal.shape[0]
+    bit_depth = np.broadcast_to(np.asarray(bit_depth), (num_channels,))
+    gain = np.broadcast_to(np.asarray(gain, dtype=float), (num_channels,))
+    offset = np.broadcast_to(np.asarray(offset, dtype=float), (num_channels,))
+    input_range = np.broadcast_to(np.asarray(input_range, dtype=float), (num_channels, 2))
+
+    codes, saturated = quantize_codes(signal, bit_depth, input_range, gain, offset, out)
+    saturated_fraction = np.count_nonzero(saturated, axis=-1) / signal.shape[-1]
+    used_levels = count_used_levels(codes, np.max(bit_depth))
+    return codes, saturated_fraction, used_levels
+
+
+def quantize_grid(signals, bit_depths, gains=(1.0,), input_ranges=((-1.0, 1.0),), offset=0.0):
+    """
+    Quantize signals over every combination of bit depth, gain and input range
+
+    Args:
+        signals: Analog signal(s), samples along the last axis
+        bit_depths: Sequence of bit depths
+        gains: Sequence of amplification factors
+        input_ranges: Sequence of (min, max) ADC input ranges
+        offset: Constant added after amplification
+
+    Returns:
+        Tuple of (codes, saturated mask, used levels). Codes and mask have shape
+        (bit depths, gains, input ranges) + signals.shape
+    """
+    signals = np.asarray(signals)
+    # Add one axis per signal batch dimension so parameters broadcast as a grid
+    trailing = (1,) * (signals.ndim - 1)
+    bit_depths = np.asarray(bit_depths).reshape((-1, 1, 1) + trailing)
+    gains = np.asarray(gains, dtype=float).reshape((1, -1, 1) + trailing)
+    input_ranges = np.asarray(input_ranges, dtype=float).reshape((1, 1, -1) + trailing + (2,))
+
+    return quantize(signals, bit_depths, input_ranges, gain=gains, offset=offset)
+
+
+def dequantize(codes, bit_depth, input_range, dtype=float):
+    """
+    Convert integer ADC codes back to analog values
+
+    Args:
+        codes: Integer codes returned by quantize
+        bit_depth: Number of bits used for quantization
+        input_range: Tuple of (min, max) representing ADC input range
+        dtype: Floating point type of the result
+
+    Returns:
+        Digital signal expressed in the units of the input range
+    """
+    min_range, max_range = split_range(input_range)
+    step = (max_range - min_range) / (2**np.asarray(bit_depth) - 1)
+
+    digital_signal = np.multiply(codes, step[..., np.newaxis], dtype=dtype)
+    digital_signal += min_range[..., np.newaxis]
+
+    return digital_signal
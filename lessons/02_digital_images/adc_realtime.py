@@ -0,0 +1,333 @@
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from adc import LevelCounter, dequantize, quantize_codes
+from signal_bank import generate_signals
+
+# Marks the end of the stream in every queue
+END_OF_STREAM = None
+
+
+class StageStats:
+    """
+    Throughput and latency counters of one pipeline stage
+
+    Latency is measured from the moment the last sample of a block would
+    have been acquired (its scheduled time) to the moment the stage is done
+    with it. Busy time is the CPU time the stage spent on its blocks.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.blocks = 0
+        self.samples = 0
+        self.busy_time = 0.0
+        self.latencies = []
+        self.max_queue = 0
+        self.dropped = 0
+        self.first_time = None
+        self.last_time = None
+
+    def record(self, block, busy_time, queue=None):
+        """Count one finished block"""
+        now = time.perf_counter()
+        if self.first_time is None:
+            self.first_time = now
+        self.last_time = now
+        self.blocks += 1
+        self.samples += block['analog'].size
+        self.busy_time += busy_time
+        self.latencies.append(now - block['acquired'])
+        if queue is not None:
+            self.max_queue = max(self.max_queue, queue.qsize())
+
+    def summary(self):
+        """
+        Returns:
+            Dictionary with block and sample counts, throughput (samples per
+            second of wall time), load (CPU time per wall time), latency
+            percentiles, the deepest input queue seen and dropped blocks
+        """
+        elapsed = (self.last_time - self.first_time) if self.blocks > 1 else float('nan')
+        latencies = np.array(self.latencies) if self.latencies else np.array([np.nan])
+        return {
+            'stage': self.name,
+            'blocks': self.blocks,
+            'samples': self.samples,
+            'throughput': self.samples / elapsed if elapsed else float('nan'),
+            'load': self.busy_time / elapsed if elapsed else float('nan'),
+            'latency_p50': float(np.percentile(latencies, 50)),
+            'latency_p99': float(np.percentile(latencies, 99)),
+            'max_queue': self.max_queue,
+            'dropped': self.dropped,
+        }
+
+
+async def run_timed(func, *args):
+    """
+    Run a numpy-heavy function in a worker thread (numpy releases the GIL)
+
+    Returns:
+        Tuple of (result, CPU time spent in the function)
+    """
+    def timed():
+        start = time.thread_time()
+        result = func(*args)
+        return result, time.thread_time() - start
+    return await asyncio.to_thread(timed)
+
+
+def replay_block(recording, start, num_samples):
+    """
+    One block of a prerecorded (channels, samples) signal, looping at its end
+
+    Returns:
+        Array of shape (channels, num_samples)
+    """
+    index = np.arange(start, start + num_samples) % recording.shape[-1]
+    return recording[:, index]
+
+
+def tone_block(start, num_samples, fs, frequencies, amplitudes, noise_std=0.0, rng=None):
+    """
+    One block of multi-channel test signal, continuous across blocks
+
+    Args:
+        start: Index of the first sample of the block
+        num_samples: Samples per channel in the block
+        fs: Sample rate
+        frequencies, amplitudes: Tones, shaped (channels, tones) or broadcastable
+        noise_std: Gaussian noise per channel
+        rng: np.random.Generator for the noise
+
+    Returns:
+        Array of shape (channels, num_samples)
+    """
+    # Advance the phase of every tone to the start of the block
+    phases = 2 * np.pi * np.asarray(frequencies, dtype=float) * (start / fs)
+    _, block = generate_signals(frequencies, amplitudes, phases, noise_std, num_samples=num_samples,
+                                duration=num_samples / fs, endpoint=False, rng=rng)
+    return block
+
+
+async def source(queue, make_block, fs, block_size, num_blocks, stats, realtime=True, drop=False):
+    """
+    Emit blocks of analog samples at the acquisition rate
+
+    Each block is due when its last sample would have been acquired. If the
+    queue is full the source either waits (backpressure: the acquisition
+    falls behind real time) or, with drop=True, discards the block like an
+    overflowing hardware FIFO.
+
+    Args:
+        queue: Bounded asyncio.Queue feeding the quantizer
+        make_block: Function (start sample, num_samples) -> (channels, samples) array
+        fs: Sample rate
+        block_size: Samples per channel per block
+        num_blocks: Number of blocks to emit
+        stats: StageStats of the source
+        realtime: Pace the blocks at fs (False: as fast as possible)
+        drop: Drop blocks instead of waiting when the queue is full
+    """
+    start_time = time.perf_counter()
+    for index in range(num_blocks):
+        due = start_time + (index + 1) * block_size / fs
+        if realtime:
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+
+        acquired = due if realtime else time.perf_counter()
+        analog, busy_time = await run_timed(make_block, index * block_size, block_size)
+        block = {'index': index, 'acquired': acquired, 'analog': analog}
+
+        if drop:
+            try:
+                queue.put_nowait(block)
+            except asyncio.QueueFull:
+                stats.dropped += 1
+                continue
+        else:
+            await queue.put(block)
+        stats.record(block, busy_time, queue)
+
+    await queue.put(END_OF_STREAM)
+
+
+async def quantizer(in_queue, out_queues, bit_depth, input_range, gain, offset, stats):
+    """
+    Convert blocks to ADC codes and fan them out to every sink
+
+    The numpy work runs in a worker thread, so the event loop keeps pacing
+    the source while a block is being converted. Waiting for the slowest
+    sink queue propagates backpressure upstream.
+    """
+    while True:
+        block = await in_queue.get()
+        if block is END_OF_STREAM:
+            break
+        (codes, saturated), busy_time = await run_timed(
+            quantize_codes, block['analog'], bit_depth, input_range, gain, offset)
+        block = dict(block, codes=codes, saturated=saturated)
+
+        for queue in out_queues:
+            await queue.put(block)
+        stats.record(block, busy_time, in_queue)
+
+    for queue in out_queues:
+        await queue.put(END_OF_STREAM)
+
+
+async def sink(queue, metric, stats):
+    """Feed every block to a rolling metric"""
+    while True:
+        block = await queue.get()
+        if block is END_OF_STREAM:
+            break
+        _, busy_time = await run_timed(metric.update, block)
+        stats.record(block, busy_time, queue)
+
+
+class RollingSaturation:
+    """Percentage of saturated samples per channel over the last window blocks"""
+
+    name = 'saturation'
+
+    def __init__(self, window):
+        self.history = deque(maxlen=window)
+
+    def update(self, block):
+        saturated = block['saturated']
+        self.history.append((np.count_nonzero(saturated, axis=-1), saturated.shape[-1]))
+
+    def value(self):
+        counts = sum(count for count, _ in self.history)
+        total = sum(size for _, size in self.history)
+        return 100 * counts / total
+
+
+class RollingLevels:
+    """Number of distinct ADC codes per channel over the last window blocks"""
+
+    name = 'used_levels'
+
+    def __init__(self, window, bit_depth, num_channels):
+        self.window = window
+        self.bit_depth = bit_depth
+        self.counter = LevelCounter(bit_depth, (num_channels,))
+        self.history = deque()
+
+    def update(self, block):
+        codes = block['codes']
+        self.counter.update(codes)
+        self.history.append(codes)
+        if len(self.history) > self.window:
+            # Remove the codes of the block that left the window
+            expired = LevelCounter(self.bit_depth, self.counter.counts.shape[:-1])
+            self.counter.counts -= expired.update(self.history.popleft()).counts
+
+    def value(self):
+        return self.counter.used_levels
+
+
+class RollingError:
+    """RMS error between the digital output and the analog input per channel over the last window blocks"""
+
+    name = 'rmse'
+
+    def __init__(self, window, bit_depth, input_range, gain=1.0, offset=0.0):
+        self.history = deque(maxlen=window)
+        self.bit_depth = bit_depth
+        self.input_range = input_range
+        self.gain = gain
+        self.offset = offset
+
+    def update(self, block):
+        # Error referred back to the input: undo offset and gain of the digital value
+        digital = (dequantize(block['codes'], self.bit_depth, self.input_range) - self.offset) / self.gain
+        squared_error = np.sum((digital - block['analog'])**2, axis=-1)
+        self.history.append((squared_error, block['analog'].shape[-1]))
+
+    def value(self):
+        total = sum(error for error, _ in self.history)
+        count = sum(size for _, size in self.history)
+        return np.sqrt(total / count)
+
+
+async def run_pipeline(make_block, fs, num_channels, bit_depth, input_range, gain=1.0, offset=0.0,
+                       block_size=1024, duration=1.0, window=32, queue_size=8, realtime=True,
+                       drop=False):
+    """
+    Stream an analog signal through a simulated ADC and rolling monitors
+
+    Pipeline: source -> bounded queue -> quantizer -> bounded queue per sink
+    -> saturation / used-levels / RMSE sinks.
+
+    Args:
+        make_block: Function (start sample, num_samples) -> (channels, samples) array
+        fs: Sample rate per channel
+        num_channels: Number of channels
+        bit_depth, input_range, gain, offset: ADC settings (see quantize_codes)
+        block_size: Samples per channel per block
+        duration: Seconds of signal to stream
+        window: Blocks covered by the rolling metrics
+        queue_size: Capacity of every queue, in blocks
+        realtime: Pace the source at fs
+        drop: Drop blocks at the source instead of applying backpressure
+
+    Returns:
+        Dictionary with 'metrics' (rolling values per channel at the end of
+        the stream) and 'stages' (StageStats summaries)
+    """
+    num_blocks = int(np.ceil(duration * fs / block_size))
+    metrics = [RollingSaturation(window), RollingLevels(window, bit_depth, num_channels),
+               RollingError(window, bit_depth, input_range, gain, offset)]
+
+    source_queue = asyncio.Queue(queue_size)
+    sink_queues = [asyncio.Queue(queue_size) for _ in metrics]
+    stats = [StageStats('source'), StageStats('quantizer')] + [StageStats(m.name) for m in metrics]
+
+    await asyncio.gather(
+        source(source_queue, make_block, fs, block_size, num_blocks, stats[0], realtime, drop),
+        quantizer(source_queue, sink_queues, bit_depth, input_range, gain, offset, stats[1]),
+        *(sink(queue, metric, s) for queue, metric, s in zip(sink_queues, metrics, stats[2:])),
+    )
+    return {
+        'metrics': {metric.name: metric.value() for metric in metrics},
+        'stages': [s.summary() for s in stats],
+    }
+
+
+def main():
+    # Neuropixels-like probe: 384 channels at 30 kHz, 10-bit ADC over +-0.6 mV
+    fs, num_channels = 30_000, 384
+    rng = np.random.default_rng(0)
+    frequencies = rng.uniform(1, 300, (num_channels, 3))
+    amplitudes = rng.uniform(0.05, 0.3, (num_channels, 3))
+
+    # Replay one second of synthetic recording, as a stand-in for hardware
+    recording = tone_block(0, fs, fs, frequencies, amplitudes, noise_std=0.02, rng=rng)
+
+    def make_block(start, num_samples):
+        return replay_block(recording, start, num_samples)
+
+    for realtime in (True, False):
+        result = asyncio.run(run_pipeline(make_block, fs, num_channels, bit_depth=10,
+                                          input_range=(-0.6, 0.6), block_size=1024, duration=2.0,
+                                          realtime=realtime))
+        print(f'{"real-time" if realtime else "as fast as possible"}:')
+        for stage in result['stages']:
+            print(f'  {stage["stage"]:12s} {stage["blocks"]:4d} blocks  '
+                  f'{stage["throughput"] / num_channels / 1000:7.1f} kS/s per channel  '
+                  f'load {stage["load"]:5.1%}  latency p50 {stage["latency_p50"] * 1000:6.1f} ms '
+                  f'p99 {stage["latency_p99"] * 1000:6.1f} ms  max queue {stage["max_queue"]}  '
+                  f'dropped {stage["dropped"]}')
+        metrics = result['metrics']
+        print(f'  saturation {metrics["saturation"].mean():.2f}%, '
+              f'used levels {metrics["used_levels"].mean():.0f}/1024, '
+              f'RMSE {metrics["rmse"].mean():.2e}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import numpy as np
+
+from adc import LevelCounter, code_dtype, quantize_codes
+
+# Values (samples of all signals together) processed at once. Peak memory
+# is about 12 bytes per value for int16 recordings (~50 MB), whatever the
+# number of channels or the length of the recording
+DEFAULT_CHUNK_SIZE = 2**22
+
+
+def open_signal(path, dtype=np.int16, num_channels=None):
+    """
+    Memory-map a recording without reading it into RAM
+
+    Args:
+        path: A .npy file, or a raw binary file
+        dtype: Sample type of a raw binary file
+        num_channels: Number of interleaved channels in a raw binary file
+
+    Returns:
+        Read-only memmap with samples along the last axis
+    """
+    if str(path).endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+
+    data = np.memmap(path, dtype=dtype, mode='r')
+    if num_channels is not None:
+        # Raw recordings are interleaved (samples, channels): put samples last
+        data = data.reshape(-1, num_channels).T
+    return data
+
+
+def create_output(path, shape, dtype):
+    """
+    Create a writable memmap for samples-last data
+
+    Args:
+        path: A .npy file, or a raw binary file (stored interleaved, like open_signal)
+        shape: Shape of the output, samples along the last axis
+        dtype: Type of the stored values
+
+    Returns:
+        Writable memmap of the given shape
+    """
+    if str(path).endswith('.npy'):
+        return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+    # Reversed shape + transpose gives samples-last view of an interleaved file
+    return np.memmap(path, dtype=dtype, mode='w+', shape=tuple(shape)[::-1]).T
+
+
+def iter_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield consecutive blocks of samples from an array, memmap or iterator
+
+    Blocks hold chunk_size values in total, so each has chunk_size divided
+    by the number of signals samples (at least one).
+
+    Args:
+        source: Array-like with samples along the last axis, or an iterator of blocks
+        chunk_size: Number of values per block (ignored for iterators)
+
+    Yields:
+        In-memory blocks with samples along the last axis
+    """
+    if not hasattr(source, 'shape'):
+        for chunk in source:
+            yield np.asarray(chunk)
+        return
+
+    num_signals = int(np.prod(source.shape[:-1]))
+    samples = max(chunk_size // max(num_signals, 1), 1)
+    for start in range(0, source.shape[-1], samples):
+        yield np.asarray(source[..., start:start + samples])
+
+
+def stream_range(source, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Find min and max of each signal with one pass over the chunks
+
+    Args:
+        source: Array-like with samples along the last axis (memmaps are fine)
+        chunk_size: Number of values per block (all signals together)
+
+    Returns:
+        Tuple of (min, max) arrays over the leading axes
+    """
+    signal_min, signal_max = None, None
+    for chunk in iter_chunks(source, chunk_size):
+        chunk_min, chunk_max = np.min(chunk, axis=-1), np.max(chunk, axis=-1)
+        if signal_min is None:
+            signal_min, signal_max = chunk_min, chunk_max
+        else:
+            signal_min = np.minimum(signal_min, chunk_min)
+            signal_max = np.maximum(signal_max, chunk_max)
+    return signal_min, signal_max
+
+
+def quantize_stream(source, bit_depth, out_path, input_range=None, gain=1.0, offset=0.0,
+                    chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Quantize a recording chunk by chunk into an on-disk array of ADC codes
+
+    Peak memory depends on chunk_size (about 12 bytes per value for int16
+    recordings), not on the recording length or the number of channels;
+    iterator blocks are processed as given, so their size sets it. With
+    input_range=None a cheap first pass finds the range of each signal (like
+    analog_to_digital in bit_depth.py); this needs a re-readable source, so
+    one-shot iterators must be given a fixed input_range.
+
+    Args:
+        source: Array, memmap (see open_signal) or iterator of sample blocks
+        bit_depth: Number of bits to use for quantization
+        out_path: Output file, .npy or raw binary (raw is written interleaved)
+        input_range: Tuple of (min, max) representing ADC input range, or None
+        gain: Amplification applied before the ADC
+        offset: Constant added after amplification
+        chunk_size: Number of values per block (all signals together)
+
+    Returns:
+        Tuple of (codes memmap, saturated sample count per signal, LevelCounter
+        with the occupancy histogram, used levels and effective bits)
+    """
+    is_iterator = not hasattr(source, 'shape')
+    if is_iterator and input_range is None:
+        raise ValueError("input_range is required when quantizing from an iterator")
+    if is_iterator and str(out_path).endswith('.npy'):
+        raise ValueError("iterators have unknown length, write them to a raw file")
+
+    full_scale = input_range is None
+    if full_scale:
+        # First pass: range of each amplified signal
+        signal_min, signal_max = stream_range(source, chunk_size)
+        low = signal_min * np.asarray(gain) + offset
+        high = signal_max * np.asarray(gain) + offset
+        input_range = np.stack([np.minimum(low, high), np.maximum(low, high)], axis=-1)
+
+    dtype = code_dtype(bit_depth)
+    out, raw_file = None, None
+    saturated_count, counter = None, None
+    start = 0
+
+    try:
+        for chunk in iter_chunks(source, chunk_size):
+            stop = start + chunk.shape[-1]
+            if is_iterator:
+                if raw_file is None:
+                    raw_file = open(out_path, 'wb')
+                codes, saturated = quantize_codes(chunk, bit_depth, input_range, gain, offset)
+                # Interleaved layout, so the file can be reopened with open_signal
+                raw_file.write(np.ascontiguousarray(codes.T).tobytes())
+            else:
+                if out is None:
+                    out = create_output(out_path, source.shape, dtype)
+                codes, saturated = quantize_codes(chunk, bit_depth, input_range, gain, offset,
+                                                  out=out[..., start:stop])
+
+            if counter is None:
+                saturated_count = np.zeros(codes.shape[:-1], dtype=np.int64)
+                counter = LevelCounter(np.max(bit_depth), codes.shape[:-1])
+
+            # Accumulate saturation and level occupancy without keeping the chunk
+            if not full_scale:
+                saturated_count += np.count_nonzero(saturated, axis=-1)
+            counter.update(codes)
+            start = stop
+    finally:
+        if raw_file is not None:
+            raw_file.close()
+
+    if counter is None:
+        raise ValueError("source contains no samples")
+
+    if is_iterator:
+        num_channels = codes.shape[0] if codes.ndim == 2 else None
+        out = open_signal(out_path, dtype=dtype, num_channels=num_channels)
+    else:
+        out.flush()
+
+    return out, saturated_count, counter
@@ -0,0 +1,209 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from adc import dequantize, quantize_grid
+
+# Metrics returned for every grid point
+METRICS = ('rmse', 'snr_db', 'sqnr_db', 'enob', 'saturation_fraction', 'used_level_fraction')
+
+# Grid dimensions, in the order of the metric arrays
+DIMS = ('bit_depth', 'gain', 'input_range', 'noise_std', 'seed')
+
+# Per-process state of the sweep workers (shared signal and grid)
+WORKER_STATE = {}
+
+
+def decibels(signal_power, error_power):
+    """Power ratio in dB (infinite when the error is exactly zero)"""
+    with np.errstate(divide='ignore'):
+        return 10 * np.log10(signal_power / error_power)
+
+
+def evaluate_signal(clean, noise, noise_std, bit_depths, gains, input_ranges):
+    """
+    Quantize one noisy realization over the whole bit depth x gain x range grid
+
+    Args:
+        clean: Noise-free analog signal
+        noise: Unit-variance noise realization (same length as clean)
+        noise_std: Noise level applied to the realization
+        bit_depths, gains, input_ranges: Grid values
+
+    Returns:
+        Dictionary of metric arrays with shape (bit depths, gains, input ranges)
+    """
+    analog = clean + noise_std * noise
+    codes, saturated, used_levels = quantize_grid(analog, bit_depths, gains, input_ranges)
+
+    # Digital signal referred back to the input (divide by the gain)
+    bits = np.asarray(bit_depths).reshape(-1, 1, 1)
+    gains = np.asarray(gains, dtype=float).reshape(1, -1, 1, 1)
+    ranges = np.asarray(input_ranges, dtype=float).reshape(1, 1, -1, 2)
+    digital = dequantize(codes, bits, ranges)
+    digital /= gains
+
+    signal_power = np.mean(clean**2)
+    total_error_power = np.mean((digital - clean)**2, axis=-1)
+    adc_error_power = np.mean((digital - analog)**2, axis=-1)
+    snr_db = decibels(signal_power, total_error_power)
+
+    return {
+        'rmse': np.sqrt(adc_error_power),
+        'snr_db': snr_db,
+        'sqnr_db': decibels(np.mean(analog**2), adc_error_power),
+        # Effective number of bits from the SINAD (sine-wave convention)
+        'enob': (snr_db - 1.76) / 6.02,
+        'saturation_fraction': np.mean(saturated, axis=-1),
+        'used_level_fraction': used_levels / 2.0**bits,
+    }
+
+
+def init_worker(shm_name, shape, dtype, grid, seed):
+    """Attach a worker process to the shared input signal"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    WORKER_STATE['shm'] = shm
+    WORKER_STATE['signal'] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    WORKER_STATE['grid'] = grid
+    WORKER_STATE['seed'] = seed
+
+
+def seed_noise(seed_index, shape):
+    """
+    Unit-variance noise realization of one seed (cached for the last seed)
+
+    Tasks are ordered seed by seed, so consecutive tasks in a worker usually
+    reuse the realization instead of drawing it again.
+    """
+    cached = WORKER_STATE.get('noise')
+    if cached is None or cached[0] != seed_index:
+        seed_sequence = np.random.SeedSequence(WORKER_STATE['seed'], spawn_key=(seed_index,))
+        cached = (seed_index, np.random.default_rng(seed_sequence).standard_normal(shape))
+        WORKER_STATE['noise'] = cached
+    return cached[1]
+
+
+def run_task(task):
+    """
+    Evaluate one (noise level, seed) point of the sweep (runs in a worker)
+
+    Every noise level of a seed scales the same noise realization (common
+    random numbers), so curves across noise levels are smooth.
+
+    Args:
+        task: Tuple of (noise level index, seed index)
+
+    Returns:
+        Tuple of (task, dictionary of metric arrays with shape
+        (bit depths, gains, input ranges))
+    """
+    noise_index, seed_index = task
+    clean = WORKER_STATE['signal']
+    bit_depths, gains, input_ranges, noise_levels = WORKER_STATE['grid']
+
+    noise = seed_noise(seed_index, clean.shape)
+    return task, evaluate_signal(clean, noise, noise_levels[noise_index], bit_depths, gains, input_ranges)
+
+
+def run_sweep(signal, bit_depths, gains=(1.0,), input_ranges=((-1.0, 1.0),), noise_levels=(0.0,),
+              num_seeds=1, seed=None, workers=None):
+    """
+    Monte-Carlo sweep of the ADC model over a parameter grid
+
+    The grid is bit depth x gain x input range x noise level x seed. Each
+    (noise level, seed) pair is one task in a process pool, so the workers
+    are kept busy even with a single seed; the clean input signal is placed
+    in shared memory once instead of being pickled for every task, and every
+    task evaluates the bit depth x gain x range grid in one broadcasted
+    quantize_grid call.
+
+    Args:
+        signal: Noise-free analog signal (1D)
+        bit_depths: Sequence of bit depths
+        gains: Sequence of amplification factors
+        input_ranges: Sequence of (min, max) ADC input ranges
+        noise_levels: Sequence of noise standard deviations
+        num_seeds: Number of random noise realizations
+        seed: Root seed; realization i uses the i-th spawned stream
+        workers: Number of worker processes (1 runs in this process)
+
+    Returns:
+        Dictionary with 'coords' (grid values per dimension) and one metric
+        array per name in METRICS, with shape ordered as DIMS
+    """
+    signal = np.ascontiguousarray(signal, dtype=float)
+    grid = (tuple(bit_depths), tuple(gains), tuple(map(tuple, input_ranges)), tuple(noise_levels))
+    shape = tuple(len(values) for values in grid) + (num_seeds,)
+    results = {name: np.empty(shape) for name in METRICS}
+    # Resolve the root entropy here so all workers draw from the same family of streams
+    entropy = np.random.SeedSequence(seed).entropy
+
+    shm = shared_memory.SharedMemory(create=True, size=signal.nbytes)
+    try:
+        np.ndarray(signal.shape, dtype=signal.dtype, buffer=shm.buf)[:] = signal
+        init_args = (shm.name, signal.shape, signal.dtype, grid, entropy)
+
+        # Seed-major order, so a worker's consecutive tasks share a noise realization
+        tasks = [(noise_index, seed_index) for seed_index in range(num_seeds)
+                 for noise_index in range(len(noise_levels))]
+
+        def collect(outputs):
+            for (noise_index, seed_index), metrics in outputs:
+                for name in METRICS:
+                    results[name][..., noise_index, seed_index] = metrics[name]
+
+        if workers == 1:
+            init_worker(*init_args)
+            collect(map(run_task, tasks))
+        else:
+            num_workers = workers or os.cpu_count() or 1
+            chunksize = max(1, len(tasks) // (4 * num_workers))
+            with ProcessPoolExecutor(workers, initializer=init_worker, initargs=init_args) as pool:
+                collect(pool.map(run_task, tasks, chunksize=chunksize))
+    finally:
+        WORKER_STATE.clear()
+        shm.close()
+        shm.unlink()
+
+    results['coords'] = dict(zip(DIMS, grid + (tuple(range(num_seeds)),)))
+    return results
+
+
+def to_dataframe(results):
+    """
+    Flatten sweep results into a long-format table (needs pandas)
+
+    Returns:
+        pandas.DataFrame with one row per grid point
+    """
+    try:
+        import pandas as pd
+    except ImportError as error:
+        raise ImportError("to_dataframe requires pandas") from error
+
+    coords = results['coords']
+    rows = list(itertools.product(*(coords[dim] for dim in DIMS)))
+    table = pd.DataFrame(rows, columns=DIMS)
+    for name in METRICS:
+        table[name] = results[name].reshape(-1)
+    return table
+
+
+def main():
+    from signal_bank import generate_base_signal
+
+    _, clean_signal = generate_base_signal(2000)
+    sweep = run_sweep(clean_signal, bit_depths=[4, 8, 12, 16], gains=[0.1, 0.5, 1.0, 2.0],
+                      input_ranges=[(-1.5, 1.5)], noise_levels=[0.0, 0.01], num_seeds=8, seed=0)
+
+    # Average over seeds for a quick look at the curves
+    enob = sweep['enob'].mean(axis=-1)[:, :, 0, 1]
+    for bits, row in zip(sweep['coords']['bit_depth'], enob):
+        print(f'{bits:2d}-bit ADC, ENOB per gain {sweep["coords"]["gain"]}: {np.round(row, 2)}')
+
+
+if __name__ == "__main__":
+    main()
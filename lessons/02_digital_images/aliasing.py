@@ -0,0 +1,250 @@
+import numpy as np
+
+from signal_bank import generate_signals
+
+# Sampling configurations processed per FFT batch
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def alias_frequency(frequencies, sampling_rates, signed=False):
+    """
+    Frequency at which a tone appears after sampling (vectorized)
+
+    A tone at f sampled at fs is indistinguishable from f - k * fs for any
+    integer k; the apparent frequency is the one closest to zero, folded
+    into [0, fs / 2].
+
+    Args:
+        frequencies: Tone frequencies in Hz (any shape)
+        sampling_rates: Sampling rates in Hz (broadcast against frequencies)
+        signed: Return f - k * fs in [-fs/2, fs/2] instead of its absolute
+            value; a negative alias means a sine appears with flipped sign
+
+    Returns:
+        Array of apparent frequencies in Hz
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    sampling_rates = np.asarray(sampling_rates, dtype=float)
+    folded = frequencies - sampling_rates * np.round(frequencies / sampling_rates)
+    return folded if signed else np.abs(folded)
+
+
+def anti_alias_gain(frequencies, cutoff, order=4):
+    """
+    Magnitude response of a Butterworth low-pass filter applied before sampling
+
+    Args:
+        frequencies: Tone frequencies in Hz
+        cutoff: -3 dB frequency in Hz (broadcast against frequencies)
+        order: Filter order (steepness, 6 dB per octave per order)
+
+    Returns:
+        Array of gains between 0 and 1
+    """
+    ratio = np.asarray(frequencies, dtype=float) / np.asarray(cutoff, dtype=float)
+    return 1 / np.sqrt(1 + ratio**(2 * order))
+
+
+def tone_parameters(frequencies, sampling_rates, amplitudes=1.0, phases=0.0, anti_alias=None,
+                    filter_order=4):
+    """
+    Broadcast a batch of sampling configurations to (configurations, tones)
+
+    Args:
+        frequencies: Tone frequencies; 1D for one tone per configuration,
+            2D (configurations, tones) for multi-tone signals
+        sampling_rates: One sampling rate per configuration
+        amplitudes, phases: Tone amplitudes and phases (broadcast to frequencies)
+        anti_alias: Cutoff of the anti-aliasing filter as a fraction of the
+            sampling rate (e.g. 0.4), or None for no filter
+        filter_order: Order of the anti-aliasing filter
+
+    Returns:
+        Tuple of (frequencies, sampling rates as a column, amplitudes after
+        the filter, phases), all 2D
+    """
+    frequencies = np.asarray(frequencies, dtype=float)
+    if frequencies.ndim < 2:
+        frequencies = frequencies.reshape(-1, 1)
+    sampling_rates = np.asarray(sampling_rates, dtype=float).reshape(-1, 1)
+    frequencies, sampling_rates, amplitudes, phases = np.broadcast_arrays(
+        frequencies, sampling_rates, np.asarray(amplitudes, dtype=float), np.asarray(phases, dtype=float))
+
+    if anti_alias is not None:
+        amplitudes = amplitudes * anti_alias_gain(frequencies, anti_alias * sampling_rates, filter_order)
+    return frequencies, sampling_rates[:, :1], amplitudes, phases
+
+
+def sample_tones(frequencies, sampling_rates, amplitudes=1.0, phases=0.0, num_samples=4096,
+                 anti_alias=None, filter_order=4, noise_std=0.0, rng=None):
+    """
+    Sample a batch of (multi-)tone signals, each at its own sampling rate
+
+    Every configuration gets num_samples samples at t = n / fs, so the batch
+    is a regular (configurations, samples) array.
+
+    Returns:
+        Array of shape (configurations, num_samples)
+    """
+    frequencies, sampling_rates, amplitudes, phases = tone_parameters(
+        frequencies, sampling_rates, amplitudes, phases, anti_alias, filter_order)
+
+    # In units of samples, a tone at f Hz is a tone at f / fs cycles per sample
+    _, samples = generate_signals(frequencies / sampling_rates, amplitudes, phases, noise_std,
+                                  num_samples=num_samples, duration=num_samples, endpoint=False,
+                                  rng=rng)
+    return samples
+
+
+def spectrum_peaks(samples, sampling_rates, num_peaks=1):
+    """
+    Frequencies of the strongest spectral peaks of a batch of sampled signals
+
+    Uses a Hann-windowed np.fft.rfft along the last axis and refines each
+    peak by fitting a parabola through the log magnitude around it.
+
+    Args:
+        samples: Array of shape (configurations, samples)
+        sampling_rates: Sampling rate of every configuration
+        num_peaks: Number of peaks to return per configuration
+
+    Returns:
+        Tuple of (peak frequencies, peak amplitudes), each of shape
+        (configurations, num_peaks), strongest first
+    """
+    samples = np.asarray(samples, dtype=float)
+    num_samples = samples.shape[-1]
+    window = np.hanning(num_samples)
+    magnitude = np.abs(np.fft.rfft(samples * window, axis=-1))
+    # Amplitude of a sine whose frequency falls exactly on a bin
+    magnitude *= 2 / window.sum()
+
+    # Only local maxima count as peaks (edges are compared with -inf)
+    padded = np.pad(magnitude, ((0, 0), (1, 1)), constant_values=-np.inf)
+    is_peak = (magnitude >= padded[:, :-2]) & (magnitude > padded[:, 2:])
+    candidates = np.where(is_peak, magnitude, -np.inf)
+
+    index = np.argsort(-candidates, axis=-1, kind='stable')[:, :num_peaks]
+    rows = np.arange(magnitude.shape[0])[:, np.newaxis]
+    log_magnitude = np.log(magnitude + 1e-300)
+    # The spectrum of a real signal is mirrored at 0 Hz and fs / 2, so the
+    # missing neighbour of an edge bin is its inner neighbour
+    last = magnitude.shape[-1] - 1
+    left = log_magnitude[rows, np.abs(index - 1)]
+    center = log_magnitude[rows, index]
+    right = log_magnitude[rows, last - np.abs(last - index - 1)]
+
+    # Parabolic interpolation of the peak position (in bins)
+    curvature = left - 2 * center + right
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shift = np.where(curvature < 0, 0.5 * (left - right) / curvature, 0.0)
+    shift = np.clip(shift, -0.5, 0.5)
+
+    bin_width = np.asarray(sampling_rates, dtype=float).reshape(-1, 1) / num_samples
+    peaks = np.clip((index + shift) * bin_width, 0, bin_width * last)
+    return peaks, magnitude[rows, index]
+
+
+def verify_aliases(frequencies, sampling_rates, amplitudes=1.0, phases=0.0, num_samples=4096,
+                   anti_alias=None, filter_order=4, min_amplitude=0.01, tolerance=1.0,
+                   chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Predict aliased frequencies and check them against the FFT of the samples
+
+    Every configuration (one row of frequencies with one sampling rate) is
+    sampled and transformed; a predicted alias counts as confirmed when one
+    of the strongest spectral peaks lies within tolerance bins of it.
+    Configurations are processed in chunks so memory stays bounded for large
+    sampling plans.
+
+    Tones that are too weak to see (below min_amplitude times the strongest
+    input tone, e.g. after the anti-aliasing filter, or a sine that lands exactly
+    on 0 Hz or fs / 2 where only its phase survives) and tones whose aliases
+    are less than three bins apart (unresolvable) are not checked.
+
+    Args:
+        frequencies: Tone frequencies, 1D or (configurations, tones)
+        sampling_rates: One sampling rate per configuration
+        amplitudes, phases: Tone amplitudes and phases
+        num_samples: Samples per configuration (FFT length)
+        anti_alias: Filter cutoff as a fraction of the sampling rate, or None
+        filter_order: Order of the anti-aliasing filter
+        min_amplitude: Amplitude relative to the strongest input tone below
+            which a tone is not checked (Hann side lobes are near 0.03)
+        tolerance: Allowed distance between predicted and measured peak, in bins
+        chunk_size: Configurations per FFT batch
+
+    Returns:
+        Dictionary with arrays of shape (configurations, tones):
+        'alias' (predicted apparent frequency), 'amplitude' (after the filter
+        and sampling), 'measured' (nearest measured peak), 'checked',
+        'confirmed' (True for unchecked tones); and 'all_confirmed' with one
+        boolean per configuration
+    """
+    frequencies, sampling_rates, input_amplitudes, phases = tone_parameters(
+        frequencies, sampling_rates, amplitudes, phases)
+    amplitudes = input_amplitudes
+    if anti_alias is not None:
+        amplitudes = amplitudes * anti_alias_gain(frequencies, anti_alias * sampling_rates, filter_order)
+    num_configs, num_tones = frequencies.shape
+    alias = alias_frequency(frequencies, sampling_rates)
+
+    # At 0 Hz and fs / 2 a sine is sampled at a fixed phase: only A * sin(phase) is left
+    at_edge = np.isclose(alias, 0) | np.isclose(alias, sampling_rates / 2)
+    visible = np.abs(amplitudes) * np.where(at_edge, np.abs(np.sin(phases)), 1.0)
+    strongest = np.abs(input_amplitudes).max(axis=1, keepdims=True)
+    checked = visible > min_amplitude * strongest
+
+    # Tones aliasing within a few bins of each other merge into one peak (Hann main lobe)
+    bin_width = sampling_rates / num_samples
+    separation = np.abs(alias[:, :, np.newaxis] - alias[:, np.newaxis, :])
+    np.einsum('cii->ci', separation)[...] = np.inf
+    checked &= separation.min(axis=-1) >= 3 * bin_width
+
+    measured = np.empty_like(alias)
+    for start in range(0, num_configs, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        samples = sample_tones(frequencies[chunk], sampling_rates[chunk], amplitudes[chunk],
+                               phases[chunk], num_samples)
+        # A few spare peaks, in case leakage of a strong tone outranks a weak one
+        peaks, _ = spectrum_peaks(samples, sampling_rates[chunk], 2 * num_tones)
+        # Nearest measured peak for every predicted alias
+        distance = np.abs(alias[chunk, :, np.newaxis] - peaks[:, np.newaxis, :])
+        nearest = np.argmin(distance, axis=-1)
+        measured[chunk] = np.take_along_axis(peaks, nearest, axis=-1)
+
+    confirmed = np.abs(measured - alias) <= tolerance * bin_width
+    return {
+        'alias': alias,
+        'amplitude': visible,
+        'measured': measured,
+        'checked': checked,
+        'confirmed': confirmed | ~checked,
+        'all_confirmed': np.all(confirmed | ~checked, axis=1),
+    }
+
+
+def main():
+    # Camera frame rates against flicker and motion frequencies, 1 Hz to 500 Hz
+    frame_rates = np.array([24.0, 30.0, 60.0, 100.0, 200.0])
+    tones = np.arange(1.0, 501.0)
+    fs, f = (grid.reshape(-1) for grid in np.meshgrid(frame_rates, tones, indexing='ij'))
+    result = verify_aliases(f, fs)
+    print(f'{f.size} camera configurations, FFT confirms the predicted alias '
+          f'in {result["all_confirmed"].sum()}')
+    for rate in frame_rates:
+        print(f'  mains flicker (100/120 Hz) at {rate:5.0f} fps appears at '
+              f'{alias_frequency([100, 120], rate)} Hz')
+
+    # Two-tone ephys plan with and without an anti-aliasing filter at 0.4 fs
+    sampling_rates = np.array([500.0, 1000.0, 2000.0, 20000.0])
+    two_tones = np.broadcast_to([[60.0, 1200.0]], (sampling_rates.size, 2))
+    for cutoff in (None, 0.4):
+        result = verify_aliases(two_tones, sampling_rates, anti_alias=cutoff)
+        print(f'anti-alias filter {cutoff}: aliases {result["alias"].tolist()}, '
+              f'amplitudes {np.round(result["amplitude"], 4).tolist()}, '
+              f'confirmed {result["all_confirmed"].tolist()}')
+
+
+if __name__ == "__main__":
+    main()
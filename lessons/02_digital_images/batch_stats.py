@@ -0,0 +1,149 @@
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image
+
+from image_stats import image_statistics
+
+# Folder with the example data shipped with the course
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        '..', '..', 'resources', 'data'))
+DEFAULT_PATTERN = os.path.join(DATA_DIR, 'histology', '**', '*.png')
+
+# Columns written before the histogram bins
+COLUMNS = ['path', 'tile_y', 'tile_x', 'height', 'width', 'mean', 'std', 'min', 'max',
+           'saturated_low', 'saturated_high']
+
+
+def iter_tiles(img, tile_size):
+    """
+    Split an image into non-overlapping tiles (border tiles may be smaller)
+
+    Yields:
+        Tuple of (y, x, tile) with the top-left pixel of each tile
+    """
+    for y in range(0, img.shape[0], tile_size):
+        for x in range(0, img.shape[1], tile_size):
+            yield y, x, img[y:y + tile_size, x:x + tile_size]
+
+
+def stats_row(path, img, bins, tile_y='', tile_x=''):
+    """Flatten the statistics of one image (or tile) into a table row"""
+    stats = image_statistics(img, bins)
+    row = [path, tile_y, tile_x, img.shape[0], img.shape[1],
+           stats['mean'], stats['std'], stats['min'], stats['max'],
+           stats['saturated_low'], stats['saturated_high']]
+    return row + stats['histogram'].tolist()
+
+
+def process_image(path, tile_size=None, bins=256):
+    """
+    Compute the statistics of one image file, and optionally of its tiles
+
+    Runs in a worker process, so it only takes and returns picklable data.
+
+    Args:
+        path: Image file
+        tile_size: If given, also compute statistics per tile of this size
+        bins: Number of histogram bins
+
+    Returns:
+        List of rows; the whole-image row comes first
+    """
+    with Image.open(path) as img:
+        img = np.asarray(img)
+
+    rows = [stats_row(path, img, bins)]
+    if tile_size:
+        rows += [stats_row(path, tile, bins, y, x) for y, x, tile in iter_tiles(img, tile_size)]
+    return rows
+
+
+def read_done(csv_path):
+    """Paths already present in a partial results file (used to resume)"""
+    if not os.path.exists(csv_path):
+        return set()
+    with open(csv_path, newline='') as f:
+        return {row['path'] for row in csv.DictReader(f)}
+
+
+def csv_to_parquet(csv_path, parquet_path):
+    """Convert the finished CSV results to Parquet (needs pandas and pyarrow)"""
+    try:
+        import pandas as pd
+    except ImportError as error:
+        raise ImportError("Writing Parquet files requires pandas and pyarrow") from error
+    pd.read_csv(csv_path).to_parquet(parquet_path, index=False)
+
+
+def run_batch(pattern, out_path, tile_size=None, bins=256, workers=None, progress=True):
+    """
+    Compute image statistics for every file matching a glob, in parallel
+
+    Rows are appended to a CSV file as soon as each image finishes, so an
+    interrupted run resumes where it stopped: images already in the file are
+    skipped. If out_path ends in .parquet, the CSV is kept next to it as
+    <out_path>.partial.csv and converted once every image is done.
+
+    Args:
+        pattern: Glob pattern of images (** is recursive)
+        out_path: Output .csv or .parquet file
+        tile_size: If given, also compute statistics per tile of this size
+        bins: Number of histogram bins
+        workers: Number of worker processes (default: number of CPUs)
+        progress: Print progress to stderr
+
+    Returns:
+        Path of the written results file
+    """
+    to_parquet = str(out_path).endswith('.parquet')
+    csv_path = str(out_path) + '.partial.csv' if to_parquet else str(out_path)
+
+    paths = sorted(glob.glob(pattern, recursive=True))
+    done = read_done(csv_path)
+    todo = [path for path in paths if path not in done]
+    if progress:
+        print(f'{len(paths)} images, {len(paths) - len(todo)} already done', file=sys.stderr)
+
+    write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    start = time.perf_counter()
+
+    with open(csv_path, 'a', newline='') as f, ProcessPoolExecutor(workers) as pool:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(COLUMNS + [f'hist_{i}' for i in range(bins)])
+
+        futures = {pool.submit(process_image, path, tile_size, bins): path for path in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            # All rows of one image are written together, then flushed to disk
+            writer.writerows(future.result())
+            f.flush()
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f'[{i}/{len(todo)}] {futures[future]} ({elapsed:.1f} s)', file=sys.stderr)
+
+    if to_parquet:
+        csv_to_parquet(csv_path, out_path)
+    return out_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute image statistics for a dataset')
+    parser.add_argument('pattern', nargs='?', default=DEFAULT_PATTERN, help='Glob pattern of images')
+    parser.add_argument('--out', default='image_stats.csv', help='Output .csv or .parquet file')
+    parser.add_argument('--tile-size', type=int, help='Also compute statistics per tile')
+    parser.add_argument('--bins', type=int, default=256, help='Number of histogram bins')
+    parser.add_argument('--workers', type=int, help='Number of worker processes')
+    args = parser.parse_args()
+
+    run_batch(args.pattern, args.out, args.tile_size, args.bins, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from adc import quantize, dequantize
+from signal_bank import generate_signals
+from trace_plot import plot_trace, step_trace
+
 def analog_to_digital(signal, bit_depth):
     """
     Convert an analog signal to digital based on the specified bit depth
@@ -12,37 +16,28 @@ def analog_to_digital(signal, bit_depth):
     Returns:
         Digitized signal with quantization based on bit depth
     """
-    # Calculate number of quantization levels (2^bit_depth)
-    levels = 2**bit_depth
-    
     # Find min and max of signal to normalize
-    signal_min = np.min(signal)
-    signal_max = np.max(signal)
+    signal_range = (np.min(signal), np.max(signal))
     
-    # Normalize signal to range [0, 1]
-    normalized = (signal - signal_min) / (signal_max - signal_min)
-    
-    # Quantize to specified bit depth
-    quantized = np.round(normalized * (levels - 1)) / (levels - 1)
+    # Quantize to integer codes over the full signal range
+    codes, _, _ = quantize(signal, bit_depth, signal_range)
     
     # Scale back to original range
-    digital_signal = quantized * (signal_max - signal_min) + signal_min
+    digital_signal = dequantize(codes, bit_depth, signal_range)
     
     return digital_signal
 
 # Generate analog signal (a sine wave with some noise)
-def generate_signal(num_samples=1000):
-    t = np.linspace(0, 1, num_samples)
+def generate_signal(num_samples=1000, rng=None):
     # Create a composite signal with two frequencies and some noise
-    signal = 0.5 * np.sin(2 * np.pi * 3 * t) + 0.3 * np.sin(2 * np.pi * 10 * t)
-    # Add some noise
-    noise = np.random.normal(0, 0.05, num_samples)
-    return t, signal + noise
+    t, signals = generate_signals([3, 10], [0.5, 0.3], noise_std=0.05,
+                                  num_samples=num_samples, rng=rng)
+    return t, signals[0]
 
 # Create figure to visualize bit depth effects
-def visualize_bit_depth():
-    # Generate our sample signal
-    t, analog_signal = generate_signal()
+def visualize_bit_depth(num_samples=1000):
+    # Generate our sample signal (long signals are decimated to the screen resolution)
+    t, analog_signal = generate_signal(num_samples)
     
     # Create a figure with subplots for different bit depths
     fig, axs = plt.subplots(4, 1, figsize=(10, 12), sharex=True)
@@ -52,7 +47,7 @@ def visualize_bit_depth():
     
     # Plot original analog signal on all subplots with higher visibility
     for ax in axs:
-        ax.plot(t, analog_signal, 'blue', linewidth=1, alpha=0.4, label='Analog')
+        plot_trace(ax, t, analog_signal, 'blue', linewidth=1, alpha=0.4, label='Analog')
     
     # Plot each digital representation with different bit depths
     for i, bits in enumerate(bit_depths):
@@ -62,7 +57,7 @@ def visualize_bit_depth():
         error = np.sqrt(np.mean((analog_signal - digital_signal)**2))
         
         # Plot digital signal
-        axs[i].step(t, digital_signal, where='post', linewidth=1.5, 
+        step_trace(axs[i], t, digital_signal, where='post', linewidth=1.5, 
                    label=f'{bits}-bit (Levels: {2**bits})')
         
         # Customize subplot
@@ -76,12 +71,15 @@ def visualize_bit_depth():
     
     # Create the zoomed inset
     zoom_ax = zoomed_inset_axes(axs[3], 4, loc='center right')
-    zoom_ax.plot(t, analog_signal, 'blue', linewidth=1, alpha=0.4)
-    zoom_ax.step(t, analog_to_digital(analog_signal, 8), where='post', linewidth=1.5)
+    
+    # Only the zoomed region is drawn in the inset
+    zoom_region_start = int(0.40 * num_samples)
+    zoom_region_end = int(0.45 * num_samples)
+    zoom = slice(zoom_region_start, zoom_region_end + 1)
+    plot_trace(zoom_ax, t[zoom], analog_signal[zoom], 'blue', linewidth=1, alpha=0.4)
+    step_trace(zoom_ax, t[zoom], analog_to_digital(analog_signal, 8)[zoom], where='post', linewidth=1.5)
     
     # Set the limits for the zoomed region
-    zoom_region_start = 400
-    zoom_region_end = 450
     y_min = min(analog_signal[zoom_region_start:zoom_region_end]) - 0.05
     y_max = max(analog_signal[zoom_region_start:zoom_region_end]) + 0.05
     
@@ -98,8 +96,11 @@ def visualize_bit_depth():
     plt.tight_layout()
     plt.subplots_adjust(top=0.94)
     
-    plt.savefig('bit_depth_visualization.png', dpi=300)
-    plt.show()
+    return fig
 
 if __name__ == "__main__":
-    visualize_bit_depth()
\ No newline at end of file
+    # Set before plotting: long traces are decimated for the saved resolution
+    plt.rcParams['savefig.dpi'] = 300
+    visualize_bit_depth()
+    plt.savefig('bit_depth_visualization.png')
+    plt.show()
\ No newline at end of file
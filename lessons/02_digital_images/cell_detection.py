@@ -0,0 +1,300 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+from skimage.segmentation import watershed
+
+from tiled_image import load_source
+
+# Folder with the example data shipped with the course
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        '..', '..', 'resources', 'data'))
+DEFAULT_PATTERN = os.path.join(DATA_DIR, 'histology', 'small_cells', '*.png')
+
+# Typical radius of a cell body in pixels (neurons of the small_cells images)
+DEFAULT_CELL_RADIUS = 18
+
+# Core side of the tiles large slides are split into
+DEFAULT_TILE_SIZE = 2048
+
+# Local threshold: standard deviations above the local mean, and smallest
+# excess over it as a fraction of the pixel range
+DEFAULT_NUM_SIGMAS = 2.0
+DEFAULT_MIN_CONTRAST = 0.03
+
+# One row per detected cell: centroid, area in pixels and raw intensities
+CELL_DTYPE = np.dtype([('y', '<f4'), ('x', '<f4'), ('area', '<i4'),
+                       ('mean_intensity', '<f4'), ('max_intensity', '<f4')])
+
+
+def disk(radius):
+    """Boolean disk footprint of the given radius"""
+    y, x = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+    return y**2 + x**2 <= radius**2
+
+
+def default_halo(cell_radius):
+    """Overlap added around tiles: covers the threshold window plus one cell"""
+    return 6 * cell_radius
+
+
+def foreground_mask(img, cell_radius=DEFAULT_CELL_RADIUS, num_sigmas=DEFAULT_NUM_SIGMAS,
+                    min_contrast=DEFAULT_MIN_CONTRAST):
+    """
+    Pixels clearly brighter than their neighbourhood (local Niblack threshold)
+
+    The image is smoothed at a quarter of the cell radius, which averages
+    out thin neurites but keeps cell bodies. A pixel is foreground when it
+    exceeds the mean of a window of three cell diameters by num_sigmas
+    standard deviations of that window, and by at least min_contrast. The
+    window statistics come from box filters, which are separable, so the
+    cost does not depend on the window size. Being local, the threshold
+    follows the neuropil density and dim or empty regions of a slide, and
+    tiles need no global pass.
+
+    Args:
+        img: 2D image
+        cell_radius: Typical cell radius in pixels
+        num_sigmas: Local standard deviations above the local mean
+        min_contrast: Smallest excess over the local mean, as a fraction of
+            the full range of the image type (scale it down for 12-bit data
+            stored as uint16)
+
+    Returns:
+        Boolean foreground mask
+    """
+    window = 6 * cell_radius
+    smoothed = ndimage.gaussian_filter(img.astype(np.float32), cell_radius / 4)
+    mean = ndimage.uniform_filter(smoothed, window)
+    spread = ndimage.uniform_filter(smoothed * smoothed, window)
+    spread -= mean * mean
+    np.sqrt(np.maximum(spread, 0, out=spread), out=spread)
+    spread *= num_sigmas
+    np.maximum(spread, min_contrast * np.iinfo(img.dtype).max, out=spread)
+    mean += spread
+    return smoothed > mean
+
+
+def segment_cells(mask, cell_radius=DEFAULT_CELL_RADIUS):
+    """
+    Split the foreground into cells with a distance-transform watershed
+
+    The mask is cleaned with an opening (removes neurites thinner than half
+    a cell radius) and hole filling. Peaks of the smoothed distance to the
+    background, at least half a cell radius apart, seed a watershed that
+    separates touching cells.
+
+    Args:
+        mask: Foreground mask (see foreground_mask)
+        cell_radius: Typical cell radius in pixels
+
+    Returns:
+        int32 label image (0 is background)
+    """
+    mask = ndimage.binary_opening(mask, disk(max(cell_radius // 4, 1)))
+    mask = ndimage.binary_fill_holes(mask)
+
+    distance = ndimage.distance_transform_edt(mask).astype(np.float32)
+    ndimage.gaussian_filter(distance, 1.5, output=distance)
+    # A square window is separable, and much faster than a disk of the same size
+    peaks = distance == ndimage.maximum_filter(distance, size=cell_radius + 1)
+    peaks &= distance >= cell_radius / 4
+    # Neighbouring peak pixels of a flat top form a single marker
+    markers, _ = ndimage.label(peaks, structure=np.ones((3, 3)))
+    # skimage's watershed: ndimage.watershed_ift leaks across the flat
+    # background of the distance map
+    return watershed(-distance, markers, mask=mask).astype(np.int32)
+
+
+def measure_cells(labels, img, min_area=None, offset=(0, 0)):
+    """
+    Centroid, area and intensity of every labelled cell, with bincount
+
+    Args:
+        labels: Label image (0 is background)
+        img: Raw image the intensities are read from
+        min_area: Smallest area in pixels kept (default: none removed)
+        offset: (y, x) added to the centroids (position of labels in the slide)
+
+    Returns:
+        Structured array of CELL_DTYPE, one row per cell
+    """
+    # Only labelled pixels matter, and cells cover a small part of a slide
+    pixels = np.flatnonzero(labels)
+    flat = labels.ravel()[pixels]
+    intensity = np.asarray(img).ravel()[pixels]
+    rows, cols = np.divmod(pixels, labels.shape[1])
+    num_labels = int(flat.max()) + 1 if flat.size else 1
+    area = np.bincount(flat, minlength=num_labels)
+    sum_y = np.bincount(flat, weights=rows, minlength=num_labels)
+    sum_x = np.bincount(flat, weights=cols, minlength=num_labels)
+    sum_intensity = np.bincount(flat, weights=intensity, minlength=num_labels)
+
+    keep = np.flatnonzero(area)
+    if min_area:
+        keep = keep[area[keep] >= min_area]
+
+    cells = np.zeros(keep.size, dtype=CELL_DTYPE)
+    cells['y'] = sum_y[keep] / area[keep] + offset[0]
+    cells['x'] = sum_x[keep] / area[keep] + offset[1]
+    cells['area'] = area[keep]
+    cells['mean_intensity'] = sum_intensity[keep] / area[keep]
+    cells['max_intensity'] = ndimage.maximum(intensity, flat, keep) if keep.size else []
+    return cells
+
+
+def tile_windows(shape, tile_size, halo):
+    """
+    Split an image into core tiles and the windows read around them
+
+    Yields:
+        Tuple of (window slices, core slices relative to the window, window origin)
+    """
+    for y in range(0, shape[0], tile_size):
+        for x in range(0, shape[1], tile_size):
+            y0, x0 = max(y - halo, 0), max(x - halo, 0)
+            y1, x1 = min(y + tile_size + halo, shape[0]), min(x + tile_size + halo, shape[1])
+            core = (slice(y - y0, min(y + tile_size, shape[0]) - y0),
+                    slice(x - x0, min(x + tile_size, shape[1]) - x0))
+            yield (slice(y0, y1), slice(x0, x1)), core, (y0, x0)
+
+
+def detect_cells(img, cell_radius=DEFAULT_CELL_RADIUS, num_sigmas=DEFAULT_NUM_SIGMAS,
+                 min_contrast=DEFAULT_MIN_CONTRAST, min_area=None, tile_size=DEFAULT_TILE_SIZE, halo=None):
+    """
+    Detect cells in a fluorescence image (bright cells on a dark background)
+
+    Images larger than one tile are processed tile by tile, each tile with a
+    halo of overlap so filters and cells crossing tile borders see their full
+    neighbourhood. A cell belongs to the tile whose core contains its
+    centroid, so none is counted twice, and memory stays bounded by the tile
+    size whatever the size of the slide.
+
+    Args:
+        img: 2D uint8 or uint16 image (array, np.memmap or TiledImage)
+        cell_radius: Typical cell radius in pixels; scales every filter
+        num_sigmas, min_contrast: Local threshold (see foreground_mask)
+        min_area: Smallest cell area in pixels (default: a disk of a third
+            of the cell radius)
+        tile_size: Core side of the tiles
+        halo: Overlap around tiles in pixels (default: default_halo)
+
+    Returns:
+        Structured array of CELL_DTYPE, one row per cell
+    """
+    if img.ndim != 2 or not np.issubdtype(img.dtype, np.integer):
+        raise ValueError(f"detect_cells expects a 2D integer image, got {img.dtype} of shape {img.shape}")
+    if halo is None:
+        halo = default_halo(cell_radius)
+    if min_area is None:
+        min_area = int(np.pi * (cell_radius / 3)**2)
+
+    cells = []
+    for window, core, origin in tile_windows(img.shape, tile_size, halo):
+        tile = np.asarray(img[window])
+        labels = segment_cells(foreground_mask(tile, cell_radius, num_sigmas, min_contrast), cell_radius)
+        found = measure_cells(labels, tile, min_area, offset=origin)
+        # Keep the cells centred in the core; the halo belongs to the neighbours
+        y, x = found['y'] - origin[0], found['x'] - origin[1]
+        cells.append(found[(y >= core[0].start) & (y < core[0].stop) &
+                           (x >= core[1].start) & (x < core[1].stop)])
+    return np.concatenate(cells)
+
+
+def detect_file(path, **options):
+    """
+    Detect the cells of one image file
+
+    Runs in a worker process, so it only takes and returns picklable data.
+
+    Returns:
+        Tuple of (path, structured array of cells, image shape)
+    """
+    img = load_source(path)
+    return path, detect_cells(img, **options), img.shape
+
+
+def detect_files(paths, workers=None, progress=True, **options):
+    """
+    Detect cells in many images in parallel, one image per worker process
+
+    Args:
+        paths: Image files
+        workers: Number of worker processes (default: number of CPUs)
+        progress: Print progress to stderr
+        **options: Passed to detect_cells
+
+    Returns:
+        Dictionary of path -> structured array of cells, in the order of paths
+    """
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(detect_file, path, **options) for path in paths]
+        for i, future in enumerate(futures, 1):
+            path, cells, shape = future.result()
+            results[path] = cells
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f'[{i}/{len(paths)}] {os.path.basename(path)} ({shape[1]}x{shape[0]}): '
+                      f'{cells.size} cells ({elapsed:.1f} s)', file=sys.stderr)
+    return results
+
+
+def save_cells(results, path):
+    """Save the cells of every image in one .npz file, keyed by file name"""
+    np.savez(path, **{os.path.basename(name): cells for name, cells in results.items()})
+
+
+def save_overlay(img, cells, path):
+    """Save the image with a cross on every detected cell, to check the detection"""
+    img = np.asarray(img)
+    if img.dtype != np.uint8:
+        # Stretch to 8 bits by the brightest pixel (16-bit slides rarely fill their range)
+        img = np.rint(img * np.float32(255 / max(float(img.max()), 1))).astype(np.uint8)
+    overlay = np.repeat(img[..., None], 3, axis=2)
+    for dy, dx in [(d, 0) for d in range(-3, 4)] + [(0, d) for d in range(-3, 4)]:
+        y = np.clip(np.rint(cells['y']).astype(int) + dy, 0, img.shape[0] - 1)
+        x = np.clip(np.rint(cells['x']).astype(int) + dx, 0, img.shape[1] - 1)
+        overlay[y, x] = (255, 0, 0)
+    Image.fromarray(overlay).save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect and count cells in fluorescence images')
+    parser.add_argument('pattern', nargs='?', default=DEFAULT_PATTERN, help='Glob pattern of images')
+    parser.add_argument('--cell-radius', type=int, default=DEFAULT_CELL_RADIUS,
+                        help='Typical cell radius in pixels')
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--workers', type=int, help='Number of worker processes')
+    parser.add_argument('--out', help='Save the cells to this .npz file')
+    parser.add_argument('--overlay-dir', help='Save images with the detected cells marked')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(args.pattern, recursive=True))
+    start = time.perf_counter()
+    results = detect_files(paths, args.workers, cell_radius=args.cell_radius, tile_size=args.tile_size)
+    elapsed = time.perf_counter() - start
+
+    for path, cells in results.items():
+        summary = (f'median area {np.median(cells["area"]):.0f} px, '
+                   f'mean intensity {cells["mean_intensity"].mean():.1f}') if cells.size else ''
+        print(f'{os.path.basename(path)}: {cells.size} cells  {summary}')
+    print(f'{len(paths)} images in {elapsed:.1f} s ({len(paths) / elapsed * 3600:.0f} images per hour)')
+
+    if args.out:
+        save_cells(results, args.out)
+    if args.overlay_dir:
+        os.makedirs(args.overlay_dir, exist_ok=True)
+        for path, cells in results.items():
+            save_overlay(load_source(path), cells, os.path.join(args.overlay_dir, os.path.basename(path)))
+
+
+if __name__ == "__main__":
+    main()
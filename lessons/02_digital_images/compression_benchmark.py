@@ -0,0 +1,214 @@
+import argparse
+import csv
+import glob
+import os
+import time
+import warnings
+
+import numpy as np
+from PIL import Image
+
+from compression import create_test_image
+from image_codecs import LOSSLESS_CODECS, codec_label, decode_image, encode_image
+from image_pyramid import load_preview
+from quality_metrics import compare_images
+
+# Folder with the example data shipped with the course
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        '..', '..', 'resources', 'data'))
+HISTOLOGY_PATTERN = os.path.join(DATA_DIR, 'histology', '*.png')
+
+# (codec, quality) settings compared by default
+DEFAULT_SETTINGS = [
+    ('JPEG', 95),
+    ('JPEG', 85),
+    ('JPEG', 50),
+    ('JPEG', 30),
+    ('PNG', None),
+    ('TIFF_LZW', None),
+    ('TIFF_DEFLATE', None),
+    ('TIFF_ZSTD', None),
+]
+
+
+def best_time(func, repeats):
+    """
+    Run a function several times and keep the fastest wall time
+
+    Returns:
+        Tuple of (result of the last call, best time in seconds)
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def time_codec(img, codec, quality=None, repeats=3):
+    """
+    Encode and decode one image with one codec setting and time it
+
+    Args:
+        img: Image to compress (uint8 or uint16)
+        codec: Codec name (see image_codecs.CODECS)
+        quality: Quality factor for lossy codecs
+        repeats: Number of timed repetitions (the fastest one is kept)
+
+    Returns:
+        Tuple of (dictionary with sizes, timings and throughput, decoded image)
+    """
+    data, encode_time = best_time(lambda: encode_image(img, codec, quality), repeats)
+    decoded, decode_time = best_time(lambda: decode_image(data), repeats)
+
+    megabytes = img.nbytes / 1e6
+    row = {
+        'codec': codec_label(codec, quality),
+        'lossless': codec in LOSSLESS_CODECS,
+        'raw_bytes': img.nbytes,
+        'encoded_bytes': len(data),
+        'compression_ratio': img.nbytes / len(data),
+        'encode_s': encode_time,
+        'decode_s': decode_time,
+        'encode_mb_s': megabytes / encode_time,
+        'decode_mb_s': megabytes / decode_time,
+    }
+    return row, decoded
+
+
+def quality_columns(metrics, index):
+    """PSNR, SSIM and MS-SSIM of one variant from compare_images"""
+    return {key: float(metrics[key][index]) for key in ('psnr', 'ssim', 'ms_ssim')}
+
+
+def benchmark_images(images, settings=DEFAULT_SETTINGS, repeats=3):
+    """
+    Benchmark every codec setting on every image
+
+    All decoded versions of an image are scored against it in one batched
+    compare_images call.
+
+    Args:
+        images: Dictionary of {name: image array}
+        settings: List of (codec, quality) pairs
+        repeats: Number of timed repetitions per measurement
+
+    Returns:
+        List of result dictionaries (one per image and codec setting)
+    """
+    results = []
+    for name, img in images.items():
+        rows, decoded = [], []
+        for codec, quality in settings:
+            try:
+                row, image = time_codec(img, codec, quality, repeats)
+            except (OSError, ValueError, KeyError) as error:
+                # e.g. JPEG cannot store 16-bit images, or zstd is not built in
+                warnings.warn(f"Skipping {codec_label(codec, quality)} for {name}: {error}")
+                continue
+            rows.append(row)
+            decoded.append(image)
+        if not rows:
+            continue
+        metrics = compare_images(img, decoded)
+        for index, row in enumerate(rows):
+            results.append({'image': name, **row, **quality_columns(metrics, index)})
+    return results
+
+
+def load_images(pattern=HISTOLOGY_PATTERN, include_synthetic=True, preview_size=None):
+    """
+    Load the images to benchmark
+
+    Args:
+        pattern: Glob pattern of image files
+        include_synthetic: Also add the synthetic image from compression.py
+        preview_size: If given, use the cached pyramid level of at least this
+            size instead of the full resolution image
+
+    Returns:
+        Dictionary of {name: image array}
+    """
+    images = {}
+    if include_synthetic:
+        images['synthetic_test_image'] = create_test_image((512, 512), np.random.default_rng(0))
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        if preview_size is not None:
+            images[os.path.basename(path)] = load_preview(path, preview_size)
+            continue
+        with Image.open(path) as img:
+            images[os.path.basename(path)] = np.asarray(img)
+    return images
+
+
+def summarize(results):
+    """
+    Total size and throughput of each codec setting over all images
+
+    Returns:
+        List of dictionaries, one per codec setting
+    """
+    summary = []
+    for codec in dict.fromkeys(row['codec'] for row in results):
+        rows = [row for row in results if row['codec'] == codec]
+        raw = sum(row['raw_bytes'] for row in rows)
+        encoded = sum(row['encoded_bytes'] for row in rows)
+        summary.append({
+            'codec': codec,
+            'encoded_bytes': encoded,
+            'compression_ratio': raw / encoded,
+            'encode_mb_s': raw / 1e6 / sum(row['encode_s'] for row in rows),
+            'decode_mb_s': raw / 1e6 / sum(row['decode_s'] for row in rows),
+            'min_psnr': min(row['psnr'] for row in rows),
+            'min_ssim': min(row['ssim'] for row in rows),
+            'min_ms_ssim': min(row['ms_ssim'] for row in rows),
+        })
+    return summary
+
+
+def print_table(rows, columns):
+    """Print a list of dictionaries as an aligned text table"""
+    def fmt(value):
+        return f'{value:.3f}' if isinstance(value, float) else str(value)
+
+    widths = [max(len(col), *(len(fmt(row[col])) for row in rows)) for col in columns]
+    print('  '.join(col.ljust(w) for col, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(fmt(row[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+def save_csv(results, path):
+    """Write benchmark results to a CSV file"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark real image codecs on histology data')
+    parser.add_argument('--pattern', default=HISTOLOGY_PATTERN, help='Glob pattern of images')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per codec')
+    parser.add_argument('--csv', help='Optional CSV file for the per-image results')
+    parser.add_argument('--preview-size', type=int,
+                        help='Benchmark a downsampled pyramid level of at least this size')
+    args = parser.parse_args()
+
+    images = load_images(args.pattern, preview_size=args.preview_size)
+    results = benchmark_images(images, repeats=args.repeats)
+    if not results:
+        raise SystemExit('No results: no images found or no codec available')
+
+    print_table(results, ['image', 'codec', 'compression_ratio', 'encode_mb_s',
+                          'decode_mb_s', 'psnr', 'ssim', 'ms_ssim'])
+    print()
+    print_table(summarize(results), ['codec', 'encoded_bytes', 'compression_ratio',
+                                     'encode_mb_s', 'decode_mb_s', 'min_psnr', 'min_ssim',
+                                     'min_ms_ssim'])
+    if args.csv:
+        save_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import time
+
+import numpy as np
+
+from adc import dequantize, quantize, split_range
+from histogram_sketch import HistogramAccumulator
+
+# Histogram resolution used for raw signals
+DEFAULT_BINS = 4096
+
+# Objectives understood by optimize_gain
+OBJECTIVES = ('levels', 'enob')
+
+
+def signal_histogram(data, bins=DEFAULT_BINS):
+    """
+    Histogram describing a signal, whatever form it comes in
+
+    Args:
+        data: Signal array, (counts, edges) tuple, or HistogramAccumulator
+            filled from a stream
+        bins: Number of bins for arrays and float accumulators, and most
+            bins of exact accumulators (one per value when they fit)
+
+    Returns:
+        Tuple of (counts, bin edges)
+    """
+    if isinstance(data, HistogramAccumulator):
+        if data.exact:
+            # Integer value v is the centre of its bin, which spans v - 0.5 to v + 0.5
+            low, high = int(data.min), int(data.max)
+            if high - low < bins:
+                counts, _ = data.histogram(None)
+                return counts[low:high + 1], np.arange(low, high + 2) - 0.5
+            # Merge values so the candidate arrays of optimize_gain stay (candidates, bins)
+            return data.histogram(bins, (low - 0.5, high + 0.5))
+        return data.histogram(bins, (data.min, data.max))
+    if isinstance(data, tuple):
+        return data
+
+    data = np.asarray(data, dtype=float).reshape(-1)
+    low, high = float(np.min(data)), float(np.max(data))
+    if high == low:
+        low, high = low - 0.5, high + 0.5
+    return np.histogram(data, bins=bins, range=(low, high))
+
+
+def candidate_tails(clip_probability, num_levels=24, num_splits=21):
+    """
+    Grid of (lower, upper) clipped tail probabilities with total at most clip_probability
+
+    Returns:
+        Tuple of (lower, upper) arrays of candidates
+    """
+    totals = np.concatenate([[0.0], np.geomspace(clip_probability * 1e-3, clip_probability, num_levels)])
+    splits = np.linspace(0, 1, num_splits)
+    totals, splits = np.meshgrid(totals, splits, indexing='ij')
+    return (totals * splits).reshape(-1), (totals * (1 - splits)).reshape(-1)
+
+
+def optimize_gain(data, bit_depth, input_range, clip_probability=1e-4, objective='enob',
+                  bins=DEFAULT_BINS):
+    """
+    Gain and offset that make the best use of an ADC, from the signal histogram
+
+    Every candidate maps the quantiles [Q(a), Q(1 - b)] of the signal exactly
+    onto the ADC input range, so a fraction a + b of the samples clips. The
+    candidates cover all splits of the allowed clipping between both tails,
+    and their quantization and clipping errors are evaluated on the
+    histogram at once, without quantizing the signal again.
+
+    'levels' picks the largest gain within the clipping budget (most ADC
+    levels used); 'enob' picks the candidate with the highest effective
+    number of bits, trading quantization noise against clipping distortion.
+
+    Clipped samples of a recording pile up in its end bins; tune from a
+    setting that clips little so the tails are known.
+
+    Args:
+        data: Signal array, (counts, edges) histogram, or HistogramAccumulator
+        bit_depth: ADC bits
+        input_range: Tuple of (min, max) ADC input voltage
+        clip_probability: Largest allowed fraction of clipped samples
+        objective: 'levels' or 'enob'
+        bins: Histogram resolution for arrays and float accumulators
+
+    Returns:
+        Dictionary with gain, offset, clip_probability, enob and
+        range_fraction (part of the ADC range spanned by the signal)
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective must be one of {OBJECTIVES}, not {objective!r}")
+    counts, edges = signal_histogram(data, bins)
+    counts = np.asarray(counts, dtype=float)
+    weights = counts / counts.sum()
+    centers = (edges[:-1] + edges[1:]) / 2
+    min_range, max_range = (float(v) for v in split_range(input_range))
+    step = (max_range - min_range) / (2**bit_depth - 1)
+
+    # Quantiles from the piecewise-linear cumulative distribution
+    cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+    lower_tail, upper_tail = candidate_tails(clip_probability)
+    low = np.interp(lower_tail, cumulative, edges)
+    high = np.interp(1 - upper_tail, cumulative, edges)
+    usable = high > low
+    lower_tail, upper_tail, low, high = (a[usable] for a in (lower_tail, upper_tail, low, high))
+    gains = (max_range - min_range) / (high - low)
+    offsets = min_range - gains * low
+
+    # ADC input for every (candidate, bin), errors from clipping and quantization
+    analog = gains[:, np.newaxis] * centers + offsets[:, np.newaxis]
+    clipped = np.clip(analog, min_range, max_range)
+    inside = (analog >= min_range) & (analog <= max_range)
+    error_power = (weights * ((analog - clipped)**2 + inside * step**2 / 12)).sum(axis=1)
+
+    mean = np.dot(weights, centers)
+    signal_power = gains**2 * np.dot(weights, (centers - mean)**2)
+    with np.errstate(divide='ignore'):
+        enob = (10 * np.log10(signal_power / error_power) - 1.76) / 6.02
+
+    best = np.argmax(gains) if objective == 'levels' else np.argmax(enob)
+    span = np.clip(gains[best] * edges[[0, -1]] + offsets[best], min_range, max_range)
+    return {
+        'gain': float(gains[best]),
+        'offset': float(offsets[best]),
+        'clip_probability': float(lower_tail[best] + upper_tail[best]),
+        'enob': float(enob[best]),
+        'range_fraction': float((span[1] - span[0]) / (max_range - min_range)),
+    }
+
+
+def measure_setting(signal, bit_depth, input_range, gain, offset):
+    """
+    Quantize a signal at one setting and measure what optimize_gain predicts
+
+    Returns:
+        Dictionary with clip_probability, enob and used_levels
+    """
+    codes, saturated, used_levels = quantize(signal, bit_depth, input_range, gain=gain, offset=offset)
+    analog = gain * signal + offset
+    error_power = np.mean((dequantize(codes, bit_depth, input_range) - analog)**2)
+    signal_power = np.var(analog)
+    return {
+        'clip_probability': float(np.mean(saturated)),
+        'enob': float((10 * np.log10(signal_power / error_power) - 1.76) / 6.02),
+        'used_levels': int(used_levels),
+    }
+
+
+def main():
+    from signal_bank import generate_signals
+
+    # Signal of fill_dynamic_range.py, recorded for 10 s at 100 kHz
+    rng = np.random.default_rng(0)
+    _, signals = generate_signals([5, 12], [0.8, 0.3], noise_std=0.1, num_samples=1_000_000,
+                                  duration=10.0, endpoint=False, rng=rng)
+    signal = signals[0]
+    bit_depth, input_range = 8, (0.0, 5.0)
+
+    for objective in OBJECTIVES:
+        for clip_probability in (1e-5, 1e-3, 1e-2):
+            start = time.perf_counter()
+            setting = optimize_gain(signal, bit_depth, input_range, clip_probability, objective)
+            elapsed = time.perf_counter() - start
+            measured = measure_setting(signal, bit_depth, input_range, setting['gain'], setting['offset'])
+            print(f'{objective:6s} clip <= {clip_probability:.0e}: gain {setting["gain"]:.3f}, '
+                  f'offset {setting["offset"]:.3f} ({elapsed * 1000:.0f} ms) | '
+                  f'predicted clip {setting["clip_probability"]:.1e}, ENOB {setting["enob"]:.2f} | '
+                  f'measured clip {measured["clip_probability"]:.1e}, ENOB {measured["enob"]:.2f}, '
+                  f'levels {measured["used_levels"]}/{2**bit_depth}')
+
+    # Streaming: tune from a 16-bit accumulator filled chunk by chunk
+    accumulator = HistogramAccumulator(np.uint16)
+    for chunk in np.array_split(signal, 10):
+        accumulator.update(np.round((chunk + 2) * 10000).astype(np.uint16))
+    start = time.perf_counter()
+    setting = optimize_gain(accumulator, 12, (-1.0, 1.0), 1e-4)
+    elapsed = time.perf_counter() - start
+    # The 65536 exact bins are merged to DEFAULT_BINS, like the histogram of the raw codes
+    reference = optimize_gain(np.round((signal + 2) * 10000), 12, (-1.0, 1.0), 1e-4)
+    print(f'stream (codes of a 16-bit recorder) -> 12-bit ADC: gain {setting["gain"]:.3e}, '
+          f'offset {setting["offset"]:.3f}, ENOB {setting["enob"]:.2f} ({elapsed * 1000:.0f} ms, '
+          f'{signal_histogram(accumulator)[0].size} bins) | from the array: gain {reference["gain"]:.3e}, '
+          f'ENOB {reference["enob"]:.2f}')
+
+
+if __name__ == "__main__":
+    main()
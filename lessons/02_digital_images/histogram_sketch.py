@@ -0,0 +1,278 @@
+import numpy as np
+
+from image_stats import EXACT_DTYPES, ImageStats
+
+# Items kept per level of the float sketch (rank error shrinks roughly as 1/k)
+DEFAULT_SKETCH_SIZE = 2048
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch for float data (KLL-style compactor hierarchy)
+
+    Level h holds items that each stand for 2**h original values. When a
+    level grows beyond k items it is sorted and every other item (random
+    offset) is promoted to the next level, so memory stays O(k log(n / k))
+    no matter how much data is added.
+
+    Args:
+        k: Capacity of each level
+        seed: Seed for the random compaction offsets
+    """
+
+    def __init__(self, k=DEFAULT_SKETCH_SIZE, seed=None):
+        self.k = k
+        self.levels = []
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.rng = np.random.default_rng(seed)
+
+    def add_items(self, level, items):
+        """Append items to one level (creating the level if needed)"""
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+        self.levels[level] = np.concatenate([self.levels[level], items])
+
+    def compact(self):
+        """Promote half of every overfull level to the level above"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self.k:
+                items = np.sort(items)
+                # An odd leftover item stays at this level
+                keep = items[items.size - items.size % 2:]
+                pairs = items[:items.size - keep.size]
+                self.levels[level] = keep
+                self.add_items(level + 1, pairs[self.rng.integers(2)::2])
+            level += 1
+
+    def update(self, values):
+        """
+        Add a chunk of values (NaNs are ignored)
+
+        Returns:
+            The sketch itself, so calls can be chained
+        """
+        values = np.asarray(values, dtype=float).reshape(-1)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        self.count += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.add_items(0, values)
+        self.compact()
+        return self
+
+    def merge(self, other):
+        """Add the content of another sketch"""
+        for level, items in enumerate(other.levels):
+            self.add_items(level, items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.compact()
+        return self
+
+    def weighted_items(self):
+        """
+        All retained items with the number of values they represent
+
+        Returns:
+            Tuple of (sorted items, weights)
+        """
+        if not self.levels:
+            return np.empty(0), np.empty(0)
+        items = np.concatenate(self.levels)
+        weights = np.repeat(2.0**np.arange(len(self.levels)), [level.size for level in self.levels])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """
+        Approximate quantiles
+
+        Args:
+            q: Quantile(s) between 0 and 1
+
+        Returns:
+            Value(s) below which a fraction q of the data lies
+        """
+        if self.count == 0:
+            raise ValueError("the sketch is empty")
+        items, weights = self.weighted_items()
+        # Each item sits in the middle of the rank interval it represents;
+        # the exact extremes (tracked separately) anchor both ends
+        positions = (np.cumsum(weights) - weights / 2) / weights.sum()
+        positions = np.concatenate([[0.0], positions, [1.0]])
+        items = np.concatenate([[self.min], items, [self.max]])
+        return np.interp(q, positions, items)
+
+
+class HistogramAccumulator:
+    """
+    Mergeable histogram/quantile accumulator for data that never fits in memory
+
+    uint8/uint16 data is counted exactly in one bin per value (ImageStats);
+    anything else goes into a KLLSketch with bounded memory. Accumulators can
+    be pickled or saved to .npz, so partial results from workers can be
+    combined with merge.
+
+    Args:
+        dtype: Data type; if None it is taken from the first chunk
+        k: Capacity per level of the float sketch
+        seed: Seed of the float sketch
+    """
+
+    def __init__(self, dtype=None, k=DEFAULT_SKETCH_SIZE, seed=None):
+        self.k = k
+        self.seed = seed
+        self.dtype = None
+        self.stats = None
+        self.sketch = None
+        if dtype is not None:
+            self.set_dtype(dtype)
+
+    def set_dtype(self, dtype):
+        """Choose exact bins or the float sketch for this data type"""
+        self.dtype = np.dtype(dtype)
+        if self.dtype in EXACT_DTYPES:
+            self.stats = ImageStats(self.dtype)
+        else:
+            self.sketch = KLLSketch(self.k, self.seed)
+
+    @property
+    def exact(self):
+        return self.stats is not None
+
+    def update(self, chunk):
+        """
+        Add a chunk of data (any shape)
+
+        Returns:
+            The accumulator itself, so calls can be chained
+        """
+        chunk = np.asarray(chunk)
+        if self.dtype is None:
+            self.set_dtype(chunk.dtype)
+        if self.exact:
+            self.stats.update(chunk.astype(self.dtype, copy=False))
+        else:
+            self.sketch.update(chunk)
+        return self
+
+    def merge(self, other):
+        """Add the content of another accumulator of the same data type"""
+        if other.dtype is None:
+            return self
+        if self.dtype is None:
+            self.set_dtype(other.dtype)
+        if other.exact != self.exact:
+            raise ValueError("cannot merge exact and sketched accumulators")
+        if self.exact:
+            self.stats.merge(other.stats)
+        else:
+            self.sketch.merge(other.sketch)
+        return self
+
+    @property
+    def count(self):
+        if self.dtype is None:
+            return 0
+        return self.stats.count if self.exact else self.sketch.count
+
+    @property
+    def min(self):
+        return self.stats.min if self.exact else self.sketch.min
+
+    @property
+    def max(self):
+        return self.stats.max if self.exact else self.sketch.max
+
+    def percentile(self, q):
+        """
+        Percentiles of all data seen so far
+
+        Exact for integer bins (same as np.percentile with linear
+        interpolation), approximate for the float sketch.
+
+        Args:
+            q: Percentile(s) between 0 and 100
+
+        Returns:
+            Value(s) at the requested percentiles
+        """
+        if self.count == 0:
+            raise ValueError("no data has been added")
+        q = np.asarray(q, dtype=float) / 100
+        if not self.exact:
+            return self.sketch.quantile(q)
+
+        # Value at a 0-based rank r is the first value whose cumulative count exceeds r
+        cumulative = np.cumsum(self.stats.counts)
+        rank = q * (self.count - 1)
+        lower = np.searchsorted(cumulative, np.floor(rank), side='right')
+        upper = np.searchsorted(cumulative, np.ceil(rank), side='right')
+        return lower + (upper - lower) * (rank - np.floor(rank))
+
+    def auto_contrast(self, saturated=0.35):
+        """
+        Display limits that clip a small fraction of pixels, like ImageJ's Auto
+
+        Args:
+            saturated: Percentage of pixels allowed to saturate (split between both tails)
+
+        Returns:
+            Tuple of (low, high) display limits
+        """
+        low, high = self.percentile([saturated / 2, 100 - saturated / 2])
+        return float(low), float(high)
+
+    def histogram(self, bins=256, value_range=None):
+        """
+        Histogram of all data seen so far (approximate for the float sketch)
+
+        Returns:
+            Tuple of (histogram, bin edges), like np.histogram
+        """
+        if self.exact:
+            return self.stats.histogram(bins, value_range)
+        items, weights = self.sketch.weighted_items()
+        if value_range is None:
+            value_range = (self.min, self.max)
+        return np.histogram(items, bins=bins, range=value_range, weights=weights)
+
+    def save(self, path):
+        """Save the accumulator to a .npz file"""
+        arrays = {'dtype': np.array('' if self.dtype is None else self.dtype.str)}
+        if self.exact:
+            arrays['counts'] = self.stats.counts
+        elif self.sketch is not None:
+            arrays['k'] = np.array(self.sketch.k)
+            arrays['extremes'] = np.array([self.sketch.count, self.sketch.min, self.sketch.max])
+            for h, items in enumerate(self.sketch.levels):
+                arrays[f'level_{h}'] = items
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load an accumulator written by save"""
+        with np.load(path) as data:
+            dtype = str(data['dtype'])
+            if not dtype:
+                return cls()
+            if 'counts' in data:
+                accumulator = cls(dtype)
+                accumulator.stats.counts[...] = data['counts']
+                return accumulator
+
+            accumulator = cls(dtype, k=int(data['k']))
+            sketch = accumulator.sketch
+            count, sketch.min, sketch.max = data['extremes']
+            sketch.count = int(count)
+            num_levels = sum(name.startswith('level_') for name in data.files)
+            sketch.levels = [data[f'level_{h}'] for h in range(num_levels)]
+            return accumulator
@@ -0,0 +1,60 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+# Codec name -> (Pillow format, default save options)
+CODECS = {
+    'PNG': ('PNG', {'compress_level': 6}),
+    'JPEG': ('JPEG', {'quality': 85}),
+    'TIFF_LZW': ('TIFF', {'compression': 'tiff_lzw'}),
+    'TIFF_DEFLATE': ('TIFF', {'compression': 'tiff_adobe_deflate'}),
+    'TIFF_ZSTD': ('TIFF', {'compression': 'zstd'}),
+}
+
+# Codecs that reproduce the input exactly
+LOSSLESS_CODECS = {'PNG', 'TIFF_LZW', 'TIFF_DEFLATE', 'TIFF_ZSTD'}
+
+
+def encode_image(img, codec, quality=None):
+    """
+    Encode an image in memory with a real codec
+
+    Args:
+        img: 2D (grayscale) or 3D (RGB) uint8 image, or 2D uint16 image
+        codec: One of the names in CODECS
+        quality: Optional quality factor (1-100) for lossy codecs
+
+    Returns:
+        The encoded file as bytes
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, choose from {sorted(CODECS)}")
+
+    file_format, options = CODECS[codec]
+    options = dict(options)
+    if quality is not None:
+        options['quality'] = int(quality)
+
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(img)).save(buffer, format=file_format, **options)
+    return buffer.getvalue()
+
+
+def decode_image(data):
+    """
+    Decode an encoded image back to a numpy array
+
+    Args:
+        data: Bytes returned by encode_image (or read from an image file)
+
+    Returns:
+        The decoded image as a numpy array
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        return np.asarray(img)
+
+
+def codec_label(codec, quality=None):
+    """Short name of a codec setting, e.g. JPEG_Q85"""
+    return codec if quality is None else f'{codec}_Q{quality}'
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+from skimage.measure import block_reduce
+
+from tiled_image import load_source
+
+# Stop adding levels once the longest side is this small
+DEFAULT_MIN_SIZE = 256
+
+# File with the pyramid description inside the pyramid directory
+METADATA_FILE = 'pyramid.json'
+
+
+def content_hash(source):
+    """
+    Hash the content of an image file (or array) to detect changes
+
+    Args:
+        source: Path to a file, or a numpy array
+
+    Returns:
+        Hex digest of the content
+    """
+    digest = hashlib.sha256()
+    if isinstance(source, np.ndarray):
+        digest.update(str((source.shape, source.dtype.str)).encode())
+        digest.update(np.ascontiguousarray(source).data)
+    else:
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(2**20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def downsample_2x(img):
+    """
+    Halve the resolution of an image by averaging 2x2 blocks
+
+    Odd rows/columns at the border are dropped instead of padded, so the
+    border is not darkened.
+
+    Args:
+        img: 2D (grayscale) or 3D (color) image
+
+    Returns:
+        Downsampled image with the same dtype
+    """
+    height, width = img.shape[0] // 2 * 2, img.shape[1] // 2 * 2
+    block_size = (2, 2) + (1,) * (img.ndim - 2)
+    reduced = block_reduce(img[:height, :width], block_size, np.mean)
+    if np.issubdtype(img.dtype, np.integer):
+        reduced = np.round(reduced)
+    return reduced.astype(img.dtype)
+
+
+class Pyramid:
+    """
+    Power-of-two image pyramid stored on disk as memory-mapped .npy levels
+
+    Level 0 is the source image; level n is downsampled 2**n times.
+
+    Args:
+        directory: Directory written by build_pyramid
+        source: The source image (path or array), read lazily for level 0
+    """
+
+    def __init__(self, directory, source=None):
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            self.metadata = json.load(f)
+        self.directory = directory
+        self.source = source
+        self.shapes = [tuple(shape) for shape in self.metadata['shapes']]
+
+    @property
+    def num_levels(self):
+        return len(self.shapes)
+
+    def level(self, n):
+        """
+        Get one level of the pyramid
+
+        Args:
+            n: Level index (0 = full resolution)
+
+        Returns:
+            Image array (a read-only memmap for n >= 1)
+        """
+        if n == 0:
+            if self.source is None:
+                raise ValueError("The source image is needed for level 0")
+            return load_source(self.source)
+        return np.load(os.path.join(self.directory, f'level_{n}.npy'), mmap_mode='r')
+
+    def best_level(self, height, width=None):
+        """
+        Find the cheapest level that still covers the requested output size
+
+        Args:
+            height: Requested output height in pixels
+            width: Requested output width (defaults to height)
+
+        Returns:
+            Index of the smallest level at least height x width (0 if none is)
+        """
+        width = height if width is None else width
+        for n in range(self.num_levels - 1, -1, -1):
+            level_height, level_width = self.shapes[n][:2]
+            if level_height >= height and level_width >= width:
+                return n
+        return 0
+
+    def get(self, height, width=None):
+        """Return the image at the cheapest level covering height x width"""
+        return self.level(self.best_level(height, width))
+
+
+def build_pyramid(source, directory=None, min_size=DEFAULT_MIN_SIZE, force=False):
+    """
+    Build (or reuse) the cached power-of-two pyramid of an image
+
+    Levels are stored next to the source in <source>.pyramid/ and are only
+    rebuilt when the content hash of the source changes.
+
+    Args:
+        source: Image path, .npy path or array
+        directory: Where to store the levels (required for arrays)
+        min_size: Smallest longest side of the last level
+        force: Rebuild even if the cache is up to date
+
+    Returns:
+        Pyramid object
+    """
+    if directory is None:
+        if isinstance(source, np.ndarray):
+            raise ValueError("directory is required when building from an array")
+        directory = str(source) + '.pyramid'
+
+    source_hash = content_hash(source)
+    metadata_path = os.path.join(directory, METADATA_FILE)
+    if not force and os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            if json.load(f).get('source_hash') == source_hash:
+                return Pyramid(directory, source)
+
+    os.makedirs(directory, exist_ok=True)
+    img = load_source(source)
+    shapes = [img.shape]
+
+    # Each level is computed from the previous one, so the source is read once
+    level = img
+    while max(level.shape[:2]) // 2 >= min_size:
+        level = downsample_2x(level)
+        np.save(os.path.join(directory, f'level_{len(shapes)}.npy'), level)
+        shapes.append(level.shape)
+
+    metadata = {
+        'source_hash': source_hash,
+        'dtype': np.dtype(img.dtype).str,
+        'shapes': [list(shape) for shape in shapes],
+    }
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    return Pyramid(directory, source)
+
+
+def load_preview(path, size):
+    """
+    Load an image at the cheapest pyramid level that is at least size x size
+
+    Use this for histograms, previews and codec comparisons that do not need
+    exact full-resolution pixels.
+
+    Args:
+        path: Image path
+        size: Requested size in pixels
+
+    Returns:
+        Image array
+    """
+    return np.asarray(build_pyramid(path).get(size))
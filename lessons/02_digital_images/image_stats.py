@@ -0,0 +1,183 @@
+import numpy as np
+
+from adc import LevelCounter
+
+# Integer types handled by the exact single-pass kernel
+EXACT_DTYPES = (np.uint8, np.uint16)
+
+
+def rebin_histogram(counts, bins, value_range):
+    """
+    Group an exact per-value histogram into coarser bins, like np.histogram
+
+    Args:
+        counts: Number of pixels at every integer value 0, 1, 2, ...
+        bins: Number of output bins
+        value_range: Tuple of (min, max) covered by the bins (max is inclusive)
+
+    Returns:
+        Tuple of (histogram, bin edges)
+    """
+    low, high = value_range
+    edges = np.linspace(low, high, bins + 1)
+    values = np.arange(counts.size)
+
+    # Same rule as np.histogram: floor of the relative position, max goes in the last bin
+    index = np.floor((values - low) * bins / (high - low)).astype(np.int64)
+    index[values == high] = bins - 1
+    inside = (values >= low) & (values <= high)
+
+    histogram = np.bincount(index[inside], weights=counts[inside], minlength=bins)
+    return histogram.astype(np.int64), edges
+
+
+class ImageStats:
+    """
+    Exact intensity statistics of uint8/uint16 images from a single pass
+
+    The only pass over the pixels is a bincount into the 256 or 65536 possible
+    values, done in bounded blocks (strided tiles are copied one bounded band
+    of rows at a time, never whole).
+    Moments, extrema, saturation counts and any coarser histogram are derived
+    from those counts, so results of tiles or chunks merge exactly.
+
+    Args:
+        dtype: Pixel type (np.uint8 or np.uint16)
+    """
+
+    def __init__(self, dtype=np.uint8):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in EXACT_DTYPES:
+            raise ValueError(f"ImageStats supports uint8 and uint16 images, not {self.dtype}")
+        self.counter = LevelCounter(8 * self.dtype.itemsize)
+
+    @classmethod
+    def from_image(cls, img):
+        """Compute the statistics of one image"""
+        return cls(img.dtype).update(img)
+
+    def update(self, img):
+        """
+        Add the pixels of an image, tile or chunk
+
+        Returns:
+            The statistics object itself, so calls can be chained
+        """
+        img = np.asarray(img)
+        if img.dtype != self.dtype:
+            raise ValueError(f"expected {self.dtype} pixels, got {img.dtype}")
+
+        if img.flags.c_contiguous or img.ndim < 2:
+            self.counter.update(img.reshape(-1))
+            return self
+
+        # Tiles are views with strided rows: copy bands of rows into one bounded
+        # buffer and count each band with a single bincount
+        rows = max(self.counter.block_size // max(img[0].size, 1), 1)
+        buffer = np.empty((min(rows, len(img)),) + img.shape[1:], dtype=img.dtype)
+        for start in range(0, len(img), rows):
+            band = buffer[:len(img[start:start + rows])]
+            band[...] = img[start:start + rows]
+            self.counter.update(band.reshape(-1))
+        return self
+
+    def merge(self, other):
+        """Add the statistics of another tile or chunk"""
+        if other.dtype != self.dtype:
+            raise ValueError("can only merge statistics of images with the same type")
+        self.counter.merge(other.counter)
+        return self
+
+    @property
+    def counts(self):
+        """Number of pixels at every possible value"""
+        return self.counter.counts
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @property
+    def mean(self):
+        values = np.arange(self.counts.size, dtype=float)
+        return float(np.dot(values, self.counts) / self.count)
+
+    @property
+    def std(self):
+        values = np.arange(self.counts.size, dtype=float) - self.mean
+        return float(np.sqrt(np.dot(values**2, self.counts) / self.count))
+
+    @property
+    def min(self):
+        return int(np.flatnonzero(self.counts)[0])
+
+    @property
+    def max(self):
+        return int(np.flatnonzero(self.counts)[-1])
+
+    @property
+    def saturated_low(self):
+        """Pixels at the lowest representable value (clipped blacks)"""
+        return int(self.counts[0])
+
+    @property
+    def saturated_high(self):
+        """Pixels at the highest representable value (clipped whites)"""
+        return int(self.counts[-1])
+
+    def histogram(self, bins=None, value_range=None):
+        """
+        Histogram of the pixel values
+
+        Args:
+            bins: Number of bins (default: one bin per possible value)
+            value_range: Tuple of (min, max) covered by the bins
+
+        Returns:
+            Tuple of (histogram, bin edges), like np.histogram
+        """
+        if bins is None:
+            return self.counts.copy(), np.arange(self.counts.size + 1)
+        if value_range is None:
+            value_range = (0, self.counts.size)
+        return rebin_histogram(self.counts, bins, value_range)
+
+
+def image_statistics(img, bins=256):
+    """
+    Compute the intensity statistics shown in image_histogram.py
+
+    uint8/uint16 images use the single-pass ImageStats kernel; other types
+    fall back to separate numpy reductions.
+
+    Args:
+        img: Image array (integer or float)
+        bins: Number of histogram bins over the full range of the image type
+
+    Returns:
+        Dictionary with mean, std, min, max, saturation counts and histogram
+    """
+    if img.dtype in EXACT_DTYPES:
+        stats = ImageStats.from_image(img)
+        return {
+            'mean': stats.mean,
+            'std': stats.std,
+            'min': stats.min,
+            'max': stats.max,
+            'saturated_low': stats.saturated_low,
+            'saturated_high': stats.saturated_high,
+            'histogram': stats.histogram(bins)[0],
+        }
+
+    value_range = (float(np.min(img)), float(np.max(img)))
+    histogram, _ = np.histogram(img, bins=bins, range=value_range)
+
+    return {
+        'mean': float(np.mean(img)),
+        'std': float(np.std(img)),
+        'min': img.min().item(),
+        'max': img.max().item(),
+        'saturated_low': int(np.count_nonzero(img == value_range[0])),
+        'saturated_high': int(np.count_nonzero(img == value_range[1])),
+        'histogram': histogram,
+    }
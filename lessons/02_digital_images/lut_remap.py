@@ -0,0 +1,179 @@
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from adc import dequantize, quantize_codes, split_range
+
+# Integer pixel types with a table entry for every possible value
+LUT_DTYPES = (np.dtype(np.uint8), np.dtype(np.uint16))
+
+# Pixels per np.take call: the intp copy of the indices stays in cache
+DEFAULT_CHUNK_SIZE = 2**18
+
+# Image rows per tile handed to a worker thread
+DEFAULT_TILE_ROWS = 256
+
+
+@lru_cache(maxsize=64)
+def cached_table(dtype, bit_depth, input_range, gain, offset, dequantized):
+    """Table for every value of dtype (arguments must be hashable, see build_lut)"""
+    values = np.arange(np.iinfo(dtype).max + 1, dtype=float)
+    codes, _ = quantize_codes(values, bit_depth, input_range, gain, offset)
+    table = dequantize(codes, bit_depth, input_range) if dequantized else codes
+    # Shared between callers: must never change
+    table.flags.writeable = False
+    return table
+
+
+def build_lut(dtype, bit_depth, input_range, gain=1.0, offset=0.0, dequantized=False):
+    """
+    Lookup table of the ADC quantization for every value of an integer pixel type
+
+    The result of quantize_codes depends only on the pixel value, so for
+    uint8/uint16 images it can be computed once for the 256 or 65536
+    possible values. Tables are cached by their settings.
+
+    Args:
+        dtype: uint8 or uint16
+        bit_depth: Bits of the output codes
+        input_range: Tuple of (min, max) ADC input range, in amplified pixel units
+        gain: Amplification applied to the pixel values
+        offset: Constant added after amplification
+        dequantized: Store the codes converted back to input units (floats)
+            instead of the codes
+
+    Returns:
+        Read-only table with one entry per pixel value
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in LUT_DTYPES:
+        raise ValueError(f"lookup tables need uint8 or uint16 pixels, not {dtype}")
+    min_range, max_range = split_range(input_range)
+    return cached_table(dtype.str, int(bit_depth), (float(min_range), float(max_range)),
+                        float(gain), float(offset), bool(dequantized))
+
+
+def check_output(img, table, out):
+    """Raise ValueError unless out can hold the table entries of every pixel of img"""
+    if out.shape != img.shape:
+        raise ValueError(f"out has shape {out.shape}, expected the image shape {img.shape}")
+    if out.dtype != table.dtype:
+        if out is img or np.shares_memory(out, img):
+            raise ValueError(f"cannot remap in place: the table holds {table.dtype} values "
+                             f"but the image is {img.dtype}")
+        raise ValueError(f"out must have the table's type {table.dtype}, not {out.dtype}")
+
+
+def apply_lut(img, table, out=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Replace every pixel by its table entry
+
+    Args:
+        img: Integer image (any shape)
+        table: Lookup table covering every value of img's type
+        out: Optional output array of img's shape and the table's type; may
+            be img itself to remap in place (ValueError otherwise)
+        chunk_size: Pixels per np.take call
+
+    Returns:
+        The remapped image (out)
+    """
+    if out is None:
+        out = np.empty(img.shape, dtype=table.dtype)
+    check_output(img, table, out)
+    if not (img.flags.c_contiguous and out.flags.c_contiguous):
+        # mode='clip' skips the bounds check: the table covers every pixel value
+        return np.take(table, img, out=out, mode='clip')
+
+    flat_img, flat_out = img.reshape(-1), out.reshape(-1)
+    for start in range(0, flat_img.size, chunk_size):
+        np.take(table, flat_img[start:start + chunk_size], out=flat_out[start:start + chunk_size],
+                mode='clip')
+    return out
+
+
+def remap_image(img, bit_depth, input_range=None, gain=1.0, offset=0.0, dequantized=False, out=None,
+                tile_rows=DEFAULT_TILE_ROWS, workers=None):
+    """
+    Quantize an integer image to a new bit depth or input range through a lookup table
+
+    Gives the same codes as quantize_codes on the float pixels (see
+    analog_to_digital_with_quantization), but costs one table read per pixel
+    instead of a float pipeline. Bands of tile_rows rows are remapped in a
+    thread pool; np.take releases the GIL, so bands run in parallel.
+
+    Args:
+        img: uint8 or uint16 image (array or np.memmap), rows along the first axis
+        bit_depth: Bits of the output codes
+        input_range: Tuple of (min, max) ADC input range; None uses the
+            range of the whole amplified image
+        gain, offset: Contrast applied before quantization
+        dequantized: Return values in input units instead of codes
+        out: Optional output array of img's shape and the table's type (may
+            be img itself when the table has img's type, e.g. 4-bit codes of a
+            uint8 image); ValueError otherwise
+        tile_rows: Rows per band
+        workers: Number of threads (default: one per CPU)
+
+    Returns:
+        Remapped image
+    """
+    img = np.asarray(img)
+    if input_range is None:
+        low, high = gain * float(img.min()) + offset, gain * float(img.max()) + offset
+        input_range = (min(low, high), max(low, high))
+    table = build_lut(img.dtype, bit_depth, input_range, gain, offset, dequantized)
+    if out is None:
+        out = np.empty(img.shape, dtype=table.dtype)
+    check_output(img, table, out)
+
+    bands = [slice(start, start + tile_rows) for start in range(0, img.shape[0], tile_rows)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(bands) == 1:
+        for band in bands:
+            apply_lut(img[band], table, out[band])
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(lambda band: apply_lut(img[band], table, out[band]), bands))
+    return out
+
+
+def main():
+    from compression_benchmark import HISTOLOGY_PATTERN
+    from underamplification import analog_to_digital_with_quantization
+
+    def best_time(func, repeats=3):
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    for path in sorted(glob.glob(HISTOLOGY_PATTERN)):
+        with Image.open(path) as opened:
+            img = np.asarray(opened)
+        print(f'{os.path.basename(path)} ({img.shape[1]}x{img.shape[0]}, {img.dtype}):')
+        for bits, input_range in ((4, (0, 255)), (6, (40, 200)), (12, (0, 255))):
+            reference, float_time = best_time(
+                lambda: analog_to_digital_with_quantization(img, bits, input_range)[0], 1)
+            values, lut_time = best_time(lambda: remap_image(img, bits, input_range, dequantized=True))
+            codes, code_time = best_time(lambda: remap_image(img, bits, input_range))
+            print(f'  {bits:2d} bits over {input_range}: float pipeline {float_time * 1000:6.1f} ms, '
+                  f'LUT values {lut_time * 1000:5.1f} ms, LUT codes ({codes.dtype}) '
+                  f'{code_time * 1000:5.1f} ms, identical {np.array_equal(values, reference)}')
+
+    # In place: the image buffer is overwritten with its 4-bit codes
+    buffer = img.copy()
+    remap_image(buffer, 4, (0, 255), out=buffer)
+    print(f'in place identical: {np.array_equal(buffer, remap_image(img, 4, (0, 255)))}, '
+          f'table cache: {cached_table.cache_info()}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from adc import MAX_BIT_DEPTH, code_dtype, dequantize, split_range
+
+# First bytes of a packed code file
+MAGIC = b'BITPACK1'
+
+# The raw data of a file starts at a multiple of this many bytes
+HEADER_ALIGN = 64
+
+# Packing groups converted per batch (bounds the temporary arrays)
+CHUNK_GROUPS = 2**18
+
+
+def group_size(bit_depth):
+    """
+    Smallest run of codes that fills whole bytes
+
+    Returns:
+        Tuple of (codes, bytes) per group, e.g. (2, 3) for 12 bits
+    """
+    if not 1 <= bit_depth <= MAX_BIT_DEPTH:
+        raise ValueError(f"bit_depth must be between 1 and {MAX_BIT_DEPTH}, got {bit_depth}")
+    bits = int(np.lcm(bit_depth, 8))
+    return bits // bit_depth, bits // 8
+
+
+def byte_layout(bit_depth):
+    """
+    Where the bits of every code of a group land in its bytes (most significant bit first)
+
+    Returns:
+        List of (code index, byte index, shift, byte mask): the code shifted
+        left by shift (right if negative) gives its bits in that byte, and
+        byte mask selects them
+    """
+    num_codes, num_bytes = group_size(bit_depth)
+    layout = []
+    for code in range(num_codes):
+        for byte in range(num_bytes):
+            # Bit positions of the group covered by both the code and the byte
+            first, stop = max(code * bit_depth, 8 * byte), min((code + 1) * bit_depth, 8 * byte + 8)
+            if first < stop:
+                shift = 8 * byte + 8 - (code + 1) * bit_depth
+                mask = sum(1 << (8 * byte + 7 - position) for position in range(first, stop))
+                layout.append((code, byte, shift, mask))
+    return layout
+
+
+def pack_groups(codes, bit_depth):
+    """
+    Pack codes (a whole number of groups) into bytes, most significant bit first
+
+    Returns:
+        uint8 array of len(codes) * bit_depth / 8 bytes
+    """
+    if bit_depth == 1:
+        return np.packbits(codes)
+    num_codes, num_bytes = group_size(bit_depth)
+    groups = codes.astype(code_dtype(bit_depth), copy=False).reshape(-1, num_codes)
+
+    # Bits shifted past the byte are dropped by the uint8 cast
+    out = np.zeros((groups.shape[0], num_bytes), dtype=np.uint8)
+    for code, byte, shift, _ in byte_layout(bit_depth):
+        column = groups[:, code] << shift if shift >= 0 else groups[:, code] >> -shift
+        out[:, byte] |= column.astype(np.uint8)
+    return out.reshape(-1)
+
+
+def unpack_groups(data, bit_depth):
+    """
+    Inverse of pack_groups
+
+    Returns:
+        Array of codes (smallest unsigned type for the bit depth)
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    if bit_depth == 1:
+        return np.unpackbits(data)
+    num_codes, num_bytes = group_size(bit_depth)
+    groups = data.reshape(-1, num_bytes)
+
+    dtype = code_dtype(bit_depth)
+    out = np.zeros((groups.shape[0], num_codes), dtype=dtype)
+    for code, byte, shift, mask in byte_layout(bit_depth):
+        column = (groups[:, byte] & mask).astype(dtype)
+        out[:, code] |= column >> shift if shift >= 0 else column << -shift
+    return out.reshape(-1)
+
+
+def pack_codes(codes, bit_depth, out=None):
+    """
+    Pack integer codes at their true width
+
+    Args:
+        codes: Integer (or boolean) codes below 2**bit_depth, any shape (packed in C order)
+        bit_depth: Bits per code (1-16)
+        out: Optional uint8 output array (e.g. a np.memmap) of packed_size bytes
+
+    Returns:
+        uint8 array with the packed bits
+    """
+    codes = np.asarray(codes).reshape(-1)
+    num_codes, num_bytes = group_size(bit_depth)
+    num_groups = -(-codes.size // num_codes)
+    if out is None:
+        out = np.empty(num_groups * num_bytes, dtype=np.uint8)
+
+    if codes.size and codes.dtype != bool and (codes.min() < 0 or codes.max() >= 2**bit_depth):
+        raise ValueError(f"codes must lie in [0, {2**bit_depth - 1}] to be packed in {bit_depth} bits")
+
+    chunk = CHUNK_GROUPS * num_codes
+    for start in range(0, codes.size, chunk):
+        block = codes[start:start + chunk]
+        if block.size % num_codes:
+            # Zero codes fill the last group
+            block = np.concatenate([block, np.zeros(-block.size % num_codes, dtype=block.dtype)])
+        first = start // num_codes * num_bytes
+        out[first:first + block.size // num_codes * num_bytes] = pack_groups(block, bit_depth)
+    return out
+
+
+def packed_size(num_codes, bit_depth):
+    """Bytes needed to pack num_codes codes of bit_depth bits"""
+    codes_per_group, bytes_per_group = group_size(bit_depth)
+    return -(-num_codes // codes_per_group) * bytes_per_group
+
+
+class PackedCodes:
+    """
+    Array of ADC codes stored at their true bit width
+
+    A 1-bit sample takes one bit instead of the 8 bytes of a float64, a
+    12-bit sample 1.5 bytes. Slicing unpacks only the bytes it touches:
+    packed[channel, t0:t1] reads (t1 - t0) codes, however long the
+    recording is. Supports integer and slice indexing on every axis.
+
+    Args:
+        data: uint8 array (or np.memmap) with the packed bits
+        shape: Shape of the unpacked codes
+        bit_depth: Bits per code
+        dtype: Type of the unpacked codes (default: smallest unsigned type)
+        input_range: Optional ADC input range, to convert codes back to signal values
+    """
+
+    def __init__(self, data, shape, bit_depth, dtype=None, input_range=None):
+        self.data = data
+        self.shape = tuple(int(n) for n in shape)
+        self.bit_depth = int(bit_depth)
+        self.dtype = np.dtype(code_dtype(bit_depth) if dtype is None else dtype)
+        self.input_range = None if input_range is None else np.asarray(input_range, dtype=float)
+        self.size = int(np.prod(self.shape))
+        if data.size < packed_size(self.size, self.bit_depth):
+            raise ValueError(f"{data.size} bytes are too few for {self.size} codes of {bit_depth} bits")
+
+    @classmethod
+    def pack(cls, codes, bit_depth, input_range=None):
+        """Pack an array of codes (e.g. from adc.quantize) or a boolean mask (1 bit)"""
+        codes = np.asarray(codes)
+        return cls(pack_codes(codes, bit_depth), codes.shape, bit_depth, codes.dtype, input_range)
+
+    @classmethod
+    def from_signal(cls, signal, bit_depth, input_range):
+        """
+        Pack a quantized signal given in input units (e.g. from analog_to_digital)
+
+        Args:
+            signal: Dequantized signal, samples along the last axis
+            bit_depth: Bits used to quantize it
+            input_range: (min, max) range it was quantized over, or one per signal
+        """
+        min_range, max_range = split_range(input_range)
+        step = (max_range - min_range) / (2**bit_depth - 1)
+        codes = np.rint((np.asarray(signal) - min_range[..., np.newaxis]) / step[..., np.newaxis])
+        codes = np.clip(codes, 0, 2**bit_depth - 1).astype(code_dtype(bit_depth))
+        return cls.pack(codes, bit_depth, input_range)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def nbytes(self):
+        """Bytes of packed data"""
+        return packed_size(self.size, self.bit_depth)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def read(self, start, stop):
+        """
+        Unpack the codes start:stop of the flattened (C order) array
+
+        Only the packing groups overlapping the range are read.
+        """
+        num_codes, num_bytes = group_size(self.bit_depth)
+        first, last = start // num_codes, -(-stop // num_codes)
+        codes = unpack_groups(self.data[first * num_bytes:last * num_bytes], self.bit_depth)
+        return codes[start - first * num_codes:stop - first * num_codes].astype(self.dtype)
+
+    def unpack(self):
+        """Unpack all codes"""
+        out = np.empty(self.size, dtype=self.dtype)
+        chunk = CHUNK_GROUPS * group_size(self.bit_depth)[0]
+        for start in range(0, self.size, chunk):
+            stop = min(start + chunk, self.size)
+            out[start:stop] = self.read(start, stop)
+        return out.reshape(self.shape)
+
+    def __array__(self, dtype=None, copy=None):
+        codes = self.unpack()
+        return codes if dtype is None else codes.astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > self.ndim:
+            raise IndexError(f"too many indices for a {self.ndim}D PackedCodes")
+        key = key + (slice(None),) * (self.ndim - len(key))
+        if not all(isinstance(k, (slice, int, np.integer)) for k in key):
+            raise TypeError("PackedCodes only supports integer and slice indexing")
+
+        # Rows are runs along the last axis, contiguous in the packed stream
+        row_length = self.shape[-1]
+        rows = np.arange(self.size // max(row_length, 1)).reshape(self.shape[:-1])[key[:-1]]
+        last = key[-1]
+        if isinstance(last, slice):
+            samples = range(*last.indices(row_length))
+        else:
+            index = int(last) + row_length if last < 0 else int(last)
+            if not 0 <= index < row_length:
+                raise IndexError(f"index {last} is out of bounds for axis of size {row_length}")
+            samples = range(index, index + 1)
+
+        out = np.empty(np.shape(rows) + (len(samples),), dtype=self.dtype)
+        if len(samples) and np.size(rows):
+            lo, hi = min(samples[0], samples[-1]), max(samples[0], samples[-1]) + 1
+            flat_rows = np.ravel(rows)
+            if lo == 0 and hi == row_length and np.all(np.diff(flat_rows) == 1):
+                # Whole consecutive rows: one contiguous read
+                block = self.read(flat_rows[0] * row_length, (flat_rows[-1] + 1) * row_length)
+                out[...] = block.reshape(np.shape(rows) + (row_length,))[..., samples[0] - lo::samples.step]
+            else:
+                for index, row in np.ndenumerate(rows):
+                    values = self.read(row * row_length + lo, row * row_length + hi)
+                    out[index] = values[samples[0] - lo::samples.step]
+        return out if isinstance(last, slice) else out[..., 0]
+
+    def to_signal(self, dtype=float):
+        """Convert all codes back to signal values over the stored input range"""
+        if self.input_range is None:
+            raise ValueError("no input_range stored with these codes")
+        return dequantize(self.unpack(), self.bit_depth, self.input_range, dtype)
+
+    def save(self, path):
+        """
+        Save to a file: magic, header length, JSON header, then the raw packed bytes
+
+        The raw bytes start on a HEADER_ALIGN boundary, so load can memory-map them.
+        """
+        header = {
+            'shape': list(self.shape),
+            'bit_depth': self.bit_depth,
+            'dtype': self.dtype.str,
+            'input_range': None if self.input_range is None else self.input_range.tolist(),
+        }
+        header = json.dumps(header).encode()
+        header += b' ' * (-(len(MAGIC) + 4 + len(header)) % HEADER_ALIGN)
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            # Write in slices, so memory-mapped data is never loaded at once
+            for start in range(0, self.nbytes, 2**24):
+                f.write(np.ascontiguousarray(self.data[start:min(start + 2**24, self.nbytes)]))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Open a file written by save
+
+        Args:
+            path: File path
+            mmap: Memory-map the packed bytes instead of reading them
+
+        Returns:
+            PackedCodes
+        """
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a packed code file")
+            header_length = int.from_bytes(f.read(4), 'little')
+            header = json.loads(f.read(header_length))
+            offset = f.tell()
+            size = packed_size(int(np.prod(header['shape'])), header['bit_depth'])
+            if not mmap:
+                data = np.fromfile(f, dtype=np.uint8, count=size)
+        if mmap:
+            data = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(size,))
+        return cls(data, header['shape'], header['bit_depth'], header['dtype'], header['input_range'])
+
+
+def main():
+    from bit_depth import analog_to_digital, generate_signal
+    from saturation import analog_to_digital_with_saturation
+
+    rng = np.random.default_rng(0)
+    _, signal = generate_signal(1_000_000, rng=rng)
+    signal_range = (signal.min(), signal.max())
+
+    with tempfile.TemporaryDirectory() as directory:
+        print('bits  float64     packed   ratio  exact')
+        for bits in (1, 2, 4, 12, 14):
+            digital = analog_to_digital(signal, bits)
+            packed = PackedCodes.from_signal(digital, bits, signal_range)
+            path = os.path.join(directory, f'signal_{bits}bit.bin')
+            packed.save(path)
+            loaded = PackedCodes.load(path)
+            exact = np.allclose(loaded.to_signal(), digital)
+            print(f'{bits:4d}  {digital.nbytes / 2**20:5.2f} MiB  {os.path.getsize(path) / 2**20:5.2f} MiB  '
+                  f'{digital.nbytes / os.path.getsize(path):5.1f}x  {exact}')
+
+        # 12-bit ADC with saturation, keeping the saturation mask at 1 bit per sample
+        digital, saturated = analog_to_digital_with_saturation(signal, 12, (-0.5, 0.5))
+        codes = PackedCodes.from_signal(digital, 12, (-0.5, 0.5))
+        mask = PackedCodes.pack(saturated, 1)
+        print(f'saturation: {digital.nbytes + saturated.nbytes} -> {codes.nbytes + mask.nbytes} bytes, '
+              f'{mask[:].sum()} saturated samples, samples 500000:500005 = {codes[500_000:500_005]}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+import glob
+import os
+import time
+
+import numpy as np
+from PIL import Image
+from scipy.ndimage import uniform_filter
+
+# Side of the tiles of the error maps, in pixels
+DEFAULT_TILE_SIZE = 256
+
+# SSIM window and constants (the defaults of skimage.metrics.structural_similarity)
+SSIM_WINDOW = 7
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+
+# Weights of the five MS-SSIM scales (Wang, Simoncelli and Bovik, 2003)
+MS_SSIM_WEIGHTS = (0.0448, 0.2856, 0.3001, 0.2363, 0.1333)
+
+# Elements of the (variants, rows, columns) arrays processed per band of rows
+BAND_ELEMENTS = 2**21
+
+
+def stack_variants(reference, variants):
+    """
+    Check a reference image against one variant or a stack of variants
+
+    Args:
+        reference: Image of shape (H, W) or (H, W, channels)
+        variants: Image of the same shape, or a stack/list of them
+
+    Returns:
+        Tuple of (reference, variants with a leading stack axis, whether a
+        single variant was given)
+    """
+    reference = np.asarray(reference)
+    if reference.ndim not in (2, 3):
+        raise ValueError(f"images must be 2D or 2D with channels, got shape {reference.shape}")
+    variants = np.asarray(variants)
+    single = variants.shape == reference.shape
+    if single:
+        variants = variants[np.newaxis]
+    if variants.shape[1:] != reference.shape:
+        raise ValueError(f"variants of shape {variants.shape[1:]} do not match the reference {reference.shape}")
+    return reference, variants, single
+
+
+def default_data_range(reference, data_range=None):
+    """Peak value for PSNR/SSIM: the largest value of an integer type unless given"""
+    if data_range is not None:
+        return float(data_range)
+    if not np.issubdtype(reference.dtype, np.integer):
+        raise ValueError("data_range is needed for floating point images")
+    return float(np.iinfo(reference.dtype).max)
+
+
+def band_size(num_variants, row_elements):
+    """Rows per band so that a (variants, rows, columns) array stays near BAND_ELEMENTS"""
+    return max(BAND_ELEMENTS // max(num_variants * row_elements, 1), 16)
+
+
+def tile_grid(shape, tile_size):
+    """Number of (tile rows, tile columns) covering an image"""
+    return -(-shape[0] // tile_size), -(-shape[1] // tile_size)
+
+
+def tile_overlap(start, stop, tile_size, num_tiles):
+    """Pixels of the range start:stop falling into each tile along one axis"""
+    edges = np.arange(num_tiles + 1) * tile_size
+    return np.clip(np.minimum(edges[1:], stop) - np.maximum(edges[:-1], start), 0, None)
+
+
+def tile_sums(values, top, left, tile_size, out, dtype=None):
+    """
+    Add values up per tile
+
+    Args:
+        values: Array of shape (variants, rows, columns[, channels]) whose first
+            pixel is at (top, left) in the image
+        top, left: Position of values in the image
+        tile_size: Tile side in pixels
+        out: Array of shape (variants, tile rows, tile columns) to add the sums to
+        dtype: Accumulator type (e.g. np.int64 for squared integer errors)
+    """
+    if values.shape[1] == 0 or values.shape[2] == 0:
+        return out
+    if values.ndim > 3:
+        values = values.sum(axis=tuple(range(3, values.ndim)), dtype=dtype)
+    # Positions inside values where a new tile starts
+    row_starts = np.union1d([0], np.arange(-top % tile_size, values.shape[1], tile_size))
+    col_starts = np.union1d([0], np.arange(-left % tile_size, values.shape[2], tile_size))
+    sums = np.add.reduceat(values, row_starts, axis=1, dtype=dtype)
+    sums = np.add.reduceat(sums, col_starts, axis=2, dtype=dtype)
+    out[:, ((top + row_starts) // tile_size)[:, np.newaxis], (left + col_starts) // tile_size] += sums
+    return out
+
+
+def squared_error_tiles(reference, variants, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Sum of squared errors per tile of every variant, accumulated in integers
+
+    Bands of rows are subtracted in int32/int64, so no float copy of the
+    images is made and the sums are exact.
+
+    Args:
+        reference: Reference image (H, W[, channels])
+        variants: Stack of images of the same shape as reference
+        tile_size: Tile side in pixels
+
+    Returns:
+        Tuple of (sums of shape (variants, tile rows, tile columns), values per tile)
+    """
+    reference, variants, _ = stack_variants(reference, variants)
+    height, width = reference.shape[:2]
+    channels = int(np.prod(reference.shape[2:]))
+    grid = tile_grid(reference.shape, tile_size)
+
+    if np.issubdtype(reference.dtype, np.integer) and reference.dtype.itemsize <= 2:
+        # Squares of 8-bit differences fit in int32; sums always go to int64
+        work = np.int32 if reference.dtype.itemsize == 1 else np.int64
+        total = np.int64
+    else:
+        work = total = np.float64
+    sums = np.zeros((len(variants),) + grid, dtype=total)
+
+    rows = band_size(len(variants), width * channels)
+    for top in range(0, height, rows):
+        error = np.subtract(variants[:, top:top + rows], reference[top:top + rows], dtype=work)
+        np.square(error, out=error)
+        tile_sums(error, top, 0, tile_size, sums, dtype=total)
+
+    counts = np.outer(tile_overlap(0, height, tile_size, grid[0]),
+                      tile_overlap(0, width, tile_size, grid[1])) * channels
+    return sums, counts
+
+
+def psnr(reference, variants, data_range=None):
+    """
+    PSNR of every variant from the exact integer squared error (no SSIM)
+
+    Returns:
+        PSNR in dB per variant (a float for a single variant); inf if identical
+    """
+    reference, stack, single = stack_variants(reference, variants)
+    data_range = default_data_range(reference, data_range)
+    squared_error, counts = squared_error_tiles(reference, stack, max(reference.shape[:2]))
+    with np.errstate(divide='ignore'):
+        result = 10 * np.log10(data_range**2 * counts.sum() / squared_error.sum(axis=(1, 2)))
+    return float(result[0]) if single else result
+
+
+def ssim_tiles(reference, variants, data_range=None, tile_size=DEFAULT_TILE_SIZE, win_size=SSIM_WINDOW):
+    """
+    Sums of the SSIM and contrast-structure maps per tile of every variant
+
+    Same definition as skimage.metrics.structural_similarity (uniform
+    window, sample covariance, window-half border excluded). Bands of rows
+    are filtered with a halo of half a window, and the statistics of the
+    reference are computed once per band for the whole stack.
+
+    Args:
+        reference: Reference image (H, W[, channels])
+        variants: Stack of images of the same shape as reference
+        data_range: Peak value (default: maximum of the integer type)
+        tile_size: Tile side in pixels
+        win_size: Side of the averaging window
+
+    Returns:
+        Tuple of (SSIM sums, contrast-structure sums), each of shape
+        (variants, tile rows, tile columns), and the values per tile
+    """
+    reference, variants, _ = stack_variants(reference, variants)
+    data_range = default_data_range(reference, data_range)
+    height, width = reference.shape[:2]
+    channels = int(np.prod(reference.shape[2:]))
+    if min(height, width) < win_size:
+        raise ValueError(f"images must be at least {win_size}x{win_size} pixels for SSIM")
+
+    grid = tile_grid(reference.shape, tile_size)
+    ssim_sums = np.zeros((len(variants),) + grid)
+    cs_sums = np.zeros((len(variants),) + grid)
+
+    pad = (win_size - 1) // 2
+    size = (win_size, win_size) + (1,) * (reference.ndim - 2)
+    cov_norm = win_size**2 / (win_size**2 - 1)
+    c1, c2 = (SSIM_K1 * data_range)**2, (SSIM_K2 * data_range)**2
+
+    rows = band_size(len(variants), width * channels)
+    for top in range(pad, height - pad, rows):
+        stop = min(top + rows, height - pad)
+        # Band plus halo, and the part whose windows lie completely inside it
+        x = reference[top - pad:stop + pad].astype(np.float64)
+        y = variants[:, top - pad:stop + pad].astype(np.float64)
+        inner = (slice(pad, -pad), slice(pad, width - pad))
+
+        # Reference statistics, shared by all variants
+        ux = uniform_filter(x, size)[inner]
+        vx = cov_norm * (uniform_filter(x * x, size)[inner] - ux * ux)
+
+        # Window means of x*y, y*y and y, filtered in place to limit temporaries
+        stack_size, stack_inner = (1,) + size, (slice(None),) + inner
+        xy = uniform_filter(np.multiply(x, y), stack_size, output=np.float64)[stack_inner]
+        yy = np.multiply(y, y)
+        yy = uniform_filter(yy, stack_size, output=yy)[stack_inner]
+        uy = uniform_filter(y, stack_size, output=y)[stack_inner]
+
+        # Contrast-structure (2 vxy + c2) / (vx + vy + c2)
+        uxy = ux * uy
+        xy -= uxy
+        xy *= 2 * cov_norm
+        xy += c2
+        yy -= uy * uy
+        yy *= cov_norm
+        yy += vx + c2
+        cs = np.divide(xy, yy, out=xy)
+
+        # Luminance (2 ux uy + c1) / (ux^2 + uy^2 + c1) times contrast-structure
+        uxy *= 2
+        uxy += c1
+        luminance = np.multiply(uy, uy, out=yy)
+        luminance += ux * ux + c1
+        ssim = np.divide(uxy, luminance, out=uxy)
+        ssim *= cs
+        tile_sums(ssim, top, pad, tile_size, ssim_sums)
+        tile_sums(cs, top, pad, tile_size, cs_sums)
+
+    counts = np.outer(tile_overlap(pad, height - pad, tile_size, grid[0]),
+                      tile_overlap(pad, width - pad, tile_size, grid[1])) * channels
+    return ssim_sums, cs_sums, counts
+
+
+def sum_dtype(dtype, peak):
+    """Smallest type holding sums of four values of magnitude up to peak (float64 for floats)"""
+    if not np.issubdtype(dtype, np.integer):
+        return np.dtype(np.float64)
+    if np.issubdtype(dtype, np.unsignedinteger):
+        return np.min_scalar_type(4 * peak)
+    return np.min_scalar_type(-4 * peak)
+
+
+def downsample_sum(img, axis, peak):
+    """
+    Sum 2x2 blocks over two spatial axes starting at axis (odd edges dropped)
+
+    The sums are accumulated in place, band by band, in the smallest type
+    that holds them (uint16 for uint8 images), so the only new array is the
+    half-resolution result.
+
+    Args:
+        img: Array with the two spatial axes at axis and axis + 1
+        axis: First spatial axis
+        peak: Largest magnitude of the values of img
+
+    Returns:
+        Array of summed blocks
+    """
+    before = (slice(None),) * axis
+    height, width = img.shape[axis] // 2, img.shape[axis + 1] // 2
+    out = np.empty(img.shape[:axis] + (height, width) + img.shape[axis + 2:], dtype=sum_dtype(img.dtype, peak))
+    rows = band_size(int(np.prod(img.shape[:axis])), width * int(np.prod(img.shape[axis + 2:])))
+    for top in range(0, height, rows):
+        stop = min(top + rows, height)
+        band = out[before + (slice(top, stop),)]
+
+        def quarter(dy, dx):
+            return img[before + (slice(2 * top + dy, 2 * stop, 2), slice(dx, 2 * width, 2))]
+
+        np.add(quarter(0, 0), quarter(1, 0), out=band, dtype=band.dtype)
+        band += quarter(0, 1)
+        band += quarter(1, 1)
+    return out
+
+
+def ms_ssim(reference, variants, data_range=None, weights=MS_SSIM_WEIGHTS, win_size=SSIM_WINDOW,
+            first_scale=None):
+    """
+    Multi-scale SSIM of every variant
+
+    Contrast-structure is measured at every scale and SSIM at the coarsest,
+    each halving the resolution. Scales are kept as integer 2x2 sums with a
+    data range four times larger per scale (SSIM does not change when both
+    are scaled), so no float copy of the images is made. Scales smaller
+    than the window are skipped and the remaining weights renormalized.
+
+    Args:
+        reference: Reference image (H, W[, channels])
+        variants: One image or a stack of images of the same shape
+        data_range: Peak value (default: maximum of the integer type)
+        weights: Exponent of every scale, finest first
+        win_size: SSIM window side
+        first_scale: Optional output of ssim_tiles at full resolution (any
+            tile size), so it is not computed twice
+
+    Returns:
+        MS-SSIM per variant (a float for a single variant)
+    """
+    reference, variants, single = stack_variants(reference, variants)
+    data_range = default_data_range(reference, data_range)
+    num_scales = 1
+    while (num_scales < len(weights)
+           and min(reference.shape[:2]) // 2**num_scales >= win_size):
+        num_scales += 1
+    weights = np.asarray(weights[:num_scales]) / np.sum(weights[:num_scales])
+
+    result = np.ones(len(variants))
+    # Bound on the pixel magnitudes, which grows fourfold with every 2x2 sum
+    dtype = np.result_type(reference, variants)
+    peak = max(-int(np.iinfo(dtype).min), int(np.iinfo(dtype).max)) if np.issubdtype(dtype, np.integer) else 0
+    for scale, weight in enumerate(weights):
+        if scale == 0 and first_scale is not None:
+            ssim_sums, cs_sums, counts = first_scale
+        else:
+            whole_image = max(reference.shape[:2])
+            ssim_sums, cs_sums, counts = ssim_tiles(reference, variants, data_range, whole_image, win_size)
+        # Negative correlations count as no similarity
+        sums = ssim_sums if scale == num_scales - 1 else cs_sums
+        result *= np.maximum(sums.sum(axis=(1, 2)) / counts.sum(), 0)**weight
+        if scale < num_scales - 1:
+            reference, variants = downsample_sum(reference, 0, peak), downsample_sum(variants, 1, peak)
+            data_range *= 4
+            peak *= 4
+    return float(result[0]) if single else result
+
+
+def compare_images(reference, variants, data_range=None, tile_size=DEFAULT_TILE_SIZE, multiscale=True):
+    """
+    Quality of compressed variants of an image: MSE, PSNR, SSIM, MS-SSIM and tile maps
+
+    Args:
+        reference: Original image (H, W[, channels])
+        variants: One decoded image or a stack/list of them (e.g. one per codec setting)
+        data_range: Peak value (default: maximum of the integer type)
+        tile_size: Tile side of the maps
+        multiscale: Also compute MS-SSIM
+
+    Returns:
+        Dictionary with 'mse', 'psnr', 'ssim' and 'ms_ssim' per variant, and
+        'mse_map', 'psnr_map' and 'ssim_map' of shape (variants, tile rows,
+        tile columns); without the variants axis for a single variant
+    """
+    reference, variants, single = stack_variants(reference, variants)
+    data_range = default_data_range(reference, data_range)
+
+    squared_error, counts = squared_error_tiles(reference, variants, tile_size)
+    ssim_sums, cs_sums, ssim_counts = ssim_tiles(reference, variants, data_range, tile_size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mse = squared_error.sum(axis=(1, 2)) / counts.sum()
+        mse_map = squared_error / counts
+        result = {
+            'mse': mse,
+            'psnr': 10 * np.log10(data_range**2 / mse),
+            'ssim': ssim_sums.sum(axis=(1, 2)) / ssim_counts.sum(),
+            'mse_map': mse_map,
+            'psnr_map': 10 * np.log10(data_range**2 / mse_map),
+            # Tiles inside the excluded border have no SSIM (NaN)
+            'ssim_map': ssim_sums / ssim_counts,
+        }
+    if multiscale:
+        result['ms_ssim'] = ms_ssim(reference, variants, data_range,
+                                    first_scale=(ssim_sums, cs_sums, ssim_counts))
+
+    if single:
+        result = {key: value[0] if np.ndim(value) > 1 else float(value[0]) for key, value in result.items()}
+    return result
+
+
+def main():
+    from compression_benchmark import HISTOLOGY_PATTERN
+    from image_codecs import decode_image, encode_image
+    from skimage.metrics import structural_similarity
+
+    qualities = list(range(10, 100, 5))
+    for path in sorted(glob.glob(HISTOLOGY_PATTERN)):
+        with Image.open(path) as opened:
+            img = np.asarray(opened)
+        variants = np.stack([decode_image(encode_image(img, 'JPEG', quality)) for quality in qualities])
+
+        start = time.perf_counter()
+        metrics = compare_images(img, variants)
+        elapsed = time.perf_counter() - start
+        print(f'{os.path.basename(path)}: {len(qualities)} JPEG settings in {elapsed:.2f} s')
+        for i, quality in enumerate(qualities):
+            worst = np.nanmin(metrics['psnr_map'][i])
+            print(f'  Q{quality:2d}: PSNR {metrics["psnr"][i]:5.2f} dB (worst tile {worst:5.2f} dB)  '
+                  f'SSIM {metrics["ssim"][i]:.4f}  MS-SSIM {metrics["ms_ssim"][i]:.4f}')
+
+        # Cross-check one setting with scikit-image
+        start = time.perf_counter()
+        reference = structural_similarity(img, variants[0], data_range=255)
+        print(f'  skimage SSIM of Q{qualities[0]}: {reference:.4f} '
+              f'({(time.perf_counter() - start) * len(qualities):.2f} s for all settings)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import ast
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Folder with the lesson scripts
+LESSON_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Figure name -> (module, function returning the figure, input data files)
+FIGURES = {
+    'analog_vs_digital': ('analog_vs_digital', 'visualize_analog_vs_digital', []),
+    'bit_depth': ('bit_depth', 'visualize_bit_depth', []),
+    'compression': ('compression', 'visualize_compression', []),
+    'exposure_time': ('exp_time', 'visualize_exposure_time', []),
+    'dynamic_range': ('fill_dynamic_range', 'visualize_dynamic_range', []),
+    'image_histogram': ('image_histogram', 'visualize_image_histograms', []),
+    'nyquist': ('nyquist', 'visualize_nyquist', []),
+    'saturation': ('saturation', 'visualize_saturation', []),
+    'under_amplification': ('underamplification', 'visualize_under_amplification', []),
+}
+
+# File in the output folder remembering what each figure was rendered from
+CACHE_FILE = '.render_cache.json'
+
+
+def local_dependencies(module_name, seen=None):
+    """
+    Find the lesson modules a module imports, recursively
+
+    Args:
+        module_name: Name of a module in the lesson folder
+
+    Returns:
+        Sorted list of module names, including module_name itself
+    """
+    seen = set() if seen is None else seen
+    path = os.path.join(LESSON_DIR, module_name + '.py')
+    if module_name in seen or not os.path.exists(path):
+        return sorted(seen)
+    seen.add(module_name)
+
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_dependencies(name.split('.')[0], seen)
+    return sorted(seen)
+
+
+def figure_hash(name, dpi):
+    """
+    Hash everything a figure depends on: its code, the code it imports, its input files and the DPI
+
+    Returns:
+        Hex digest identifying this version of the figure
+    """
+    module_name, function_name, inputs = FIGURES[name]
+    digest = hashlib.sha256(f'{function_name}:{dpi}'.encode())
+    files = [os.path.join(LESSON_DIR, m + '.py') for m in local_dependencies(module_name)]
+    for path in files + list(inputs):
+        digest.update(path.encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def use_agg_backend():
+    """Select the non-interactive backend (runs once in every worker)"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_figure(name, out_dir, formats, dpi):
+    """
+    Build one figure and save it in every requested format (runs in a worker)
+
+    Returns:
+        Tuple of (figure name, list of written files)
+    """
+    use_agg_backend()
+    import matplotlib.pyplot as plt
+
+    # Long traces are decimated for the resolution they will be saved at (see trace_plot)
+    plt.rcParams['savefig.dpi'] = dpi
+    module_name, function_name, _ = FIGURES[name]
+    fig = getattr(importlib.import_module(module_name), function_name)()
+
+    paths = []
+    for file_format in formats:
+        path = os.path.join(out_dir, f'{name}.{file_format}')
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+    plt.close(fig)
+    return name, paths
+
+
+def render_all(names=None, out_dir='figures', formats=('png',), dpi=300, workers=None,
+               force=False, progress=True):
+    """
+    Render lesson figures headlessly in parallel, skipping unchanged ones
+
+    A figure is re-rendered only when its code (or any lesson module it
+    imports), its input files or the DPI changed since the last run, or when
+    one of the requested files is missing.
+
+    Args:
+        names: Figure names to render (default: all in FIGURES)
+        out_dir: Output folder
+        formats: File formats, e.g. ('png', 'svg', 'pdf')
+        dpi: Resolution of raster outputs
+        workers: Number of worker processes (default: number of CPUs)
+        force: Render even if the cache says the figure is up to date
+        progress: Print progress to stderr
+
+    Returns:
+        List of names of the figures that were rendered
+    """
+    names = list(FIGURES) if names is None else list(names)
+    unknown = set(names) - set(FIGURES)
+    if unknown:
+        raise ValueError(f"Unknown figures {sorted(unknown)}, choose from {sorted(FIGURES)}")
+
+    os.makedirs(out_dir, exist_ok=True)
+    cache_path = os.path.join(out_dir, CACHE_FILE)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+
+    # Decide per figure which formats are stale
+    todo = {}
+    hashes = {name: figure_hash(name, dpi) for name in names}
+    for name in names:
+        stale = [fmt for fmt in formats
+                 if force or cache.get(name, {}).get(fmt) != hashes[name]
+                 or not os.path.exists(os.path.join(out_dir, f'{name}.{fmt}'))]
+        if stale:
+            todo[name] = stale
+    if progress:
+        print(f'{len(names)} figures, {len(names) - len(todo)} up to date', file=sys.stderr)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers, initializer=use_agg_backend) as pool:
+        futures = [pool.submit(render_figure, name, out_dir, stale, dpi)
+                   for name, stale in todo.items()]
+        for future in as_completed(futures):
+            name, paths = future.result()
+            for fmt in todo[name]:
+                cache.setdefault(name, {})[fmt] = hashes[name]
+            # Save the cache after every figure so an interrupted run keeps its work
+            with open(cache_path, 'w') as f:
+                json.dump(cache, f, indent=2)
+            if progress:
+                elapsed = time.perf_counter() - start
+                print(f'{name}: {", ".join(paths)} ({elapsed:.1f} s)', file=sys.stderr)
+
+    return list(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render all lesson figures without opening windows')
+    parser.add_argument('names', nargs='*', help=f'Figures to render (default: all of {", ".join(FIGURES)})')
+    parser.add_argument('--out-dir', default='figures', help='Output folder')
+    parser.add_argument('--formats', nargs='+', default=['png'], help='png, svg, pdf, ...')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--workers', type=int, help='Number of worker processes')
+    parser.add_argument('--force', action='store_true', help='Ignore the cache')
+    args = parser.parse_args()
+
+    render_all(args.names or None, args.out_dir, args.formats, args.dpi, args.workers, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,34 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from adc import quantize, dequantize
+from signal_bank import generate_base_signal
+from trace_plot import fill_between_trace, plot_trace, run_edges, step_trace
+
 def analog_to_digital_with_saturation(signal, bit_depth, input_range):
     """
     Convert an analog signal to digital with saturation effects
     
     Args:
-        signal: The original analog signal
-        bit_depth: Number of bits to use for quantization
+        signal: The original analog signal, or a (channels, samples) block
+        bit_depth: Number of bits to use for quantization (or one per channel)
         input_range: Tuple of (min, max) representing ADC input range
+            (or a (channels, 2) array of per-channel ranges)
     
     Returns:
         Tuple of (digital signal, saturated mask)
     """
-    # Calculate number of quantization levels
-    levels = 2**bit_depth
-    
-    # Get input range limits
-    min_range, max_range = input_range
-    
-    # Clip signal to the ADC input range (this is the saturation)
-    saturated_signal = np.clip(signal, min_range, max_range)
-    
-    # Create a mask to identify where saturation occurred
-    saturation_mask = (signal < min_range) | (signal > max_range)
-    
-    # Normalize to [0, 1] for quantization
-    normalized = (saturated_signal - min_range) / (max_range - min_range)
-    
-    # Quantize to specified bit depth
-    quantized = np.round(normalized * (levels - 1)) / (levels - 1)
+    # Clip to the ADC input range (this is the saturation) and quantize
+    codes, saturation_mask, _ = quantize(signal, bit_depth, input_range)
     
     # Scale back to original range
-    digital_signal = quantized * (max_range - min_range) + min_range
+    digital_signal = dequantize(codes, bit_depth, input_range)
     
     return digital_signal, saturation_mask
 
-def generate_base_signal(num_samples=1000):
-    """Generate a base signal with constant amplitude"""
-    t = np.linspace(0, 1, num_samples)
-    
-    # Base frequency
-    freq = 5
-    
-    # Create a sinusoidal signal with some harmonics for interest
-    signal = np.sin(2 * np.pi * freq * t) + 0.3 * np.sin(2 * np.pi * freq * 3 * t)
-    
-    return t, signal
-
-def visualize_saturation():
-    # Generate our base signal
-    t, base_signal = generate_base_signal()
+def visualize_saturation(num_samples=1000):
+    # Generate our base signal (long signals are decimated to the screen resolution)
+    t, base_signal = generate_base_signal(num_samples)
     
     # Set up the figure
     fig, axs = plt.subplots(3, 1, figsize=(12, 10), sharex=True)
@@ -78,10 +56,13 @@ def visualize_saturation():
             analog_signal, bit_depth, input_range)
         
         # Plot the original analog signal
-        axs[i].plot(t, analog_signal, 'blue', alpha=0.4, label='Analog Signal')
+        plot_trace(axs[i], t, analog_signal, 'blue', alpha=0.4, label='Analog Signal')
+        
+        # Samples where saturation starts or ends are always drawn, so plateaus stay exact
+        saturation_edges = run_edges(saturation_mask)
         
         # Plot the digital signal (potentially saturated)
-        axs[i].step(t, digital_signal, 'green', where='post', 
+        step_trace(axs[i], t, digital_signal, 'green', where='post', keep=saturation_edges,
                    label=f'Digital Signal ({bit_depth}-bit)')
         
         # Highlight saturated regions
@@ -98,10 +79,10 @@ def visualize_saturation():
         axs[i].axhline(y=max_range, color='r', linestyle='--', alpha=0.5)
         
         # Fill the area outside the ADC range with light red
-        axs[i].fill_between(t, min_range, np.minimum(analog_signal, min_range), 
-                          color='red', alpha=0.2)
-        axs[i].fill_between(t, max_range, np.maximum(analog_signal, max_range), 
-                          color='red', alpha=0.2)
+        fill_between_trace(axs[i], t, min_range, np.minimum(analog_signal, min_range),
+                           keep=saturation_edges, color='red', alpha=0.2)
+        fill_between_trace(axs[i], t, max_range, np.maximum(analog_signal, max_range),
+                           keep=saturation_edges, color='red', alpha=0.2)
         
         # Customize subplot
         axs[i].set_ylabel('Amplitude')
@@ -128,8 +109,11 @@ def visualize_saturation():
     plt.tight_layout()
     plt.subplots_adjust(top=0.92, bottom=0.08)
     
-    plt.savefig('saturation_visualization.png', dpi=300)
-    plt.show()
+    return fig
 
 if __name__ == "__main__":
+    # Set before plotting: long traces are decimated for the saved resolution
+    plt.rcParams['savefig.dpi'] = 300
     visualize_saturation()
+    plt.savefig('saturation_visualization.png')
+    plt.show()
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+def spawn_generators(seed, num_workers):
+    """
+    Create independent random generators, e.g. one per worker process
+
+    Args:
+        seed: Root seed (int or None)
+        num_workers: Number of generators
+
+    Returns:
+        List of np.random.Generator with non-overlapping streams
+    """
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(num_workers)]
+
+
+def generate_signals(frequencies, amplitudes, phases=0.0, noise_std=0.0, num_samples=1000,
+                     duration=1.0, endpoint=True, rng=None, dtype=np.float64):
+    """
+    Generate a batch of sine mixtures (plus optional Gaussian noise) in one call
+
+    frequencies, amplitudes and phases broadcast to (signals, tones): a 1D
+    array describes the tones of a single signal, a column such as
+    amplitudes[:, None] varies a parameter across signals.
+
+    Args:
+        frequencies: Tone frequencies in Hz
+        amplitudes: Tone amplitudes
+        phases: Tone phases in radians
+        noise_std: Standard deviation of the noise (scalar or one per signal)
+        num_samples: Number of samples per signal
+        duration: Length of the signals in seconds
+        endpoint: Whether the last sample is at t = duration (like np.linspace)
+        rng: np.random.Generator for the noise (a new unseeded one if None)
+        dtype: np.float64, or np.float32 to halve memory
+
+    Returns:
+        Tuple of (time vector, signals array of shape (signals, samples))
+    """
+    frequencies, amplitudes, phases = np.broadcast_arrays(
+        *(np.atleast_2d(np.asarray(p, dtype=dtype)) for p in (frequencies, amplitudes, phases)))
+    num_signals, num_tones = frequencies.shape
+    noise_std = np.broadcast_to(np.asarray(noise_std, dtype=dtype), (num_signals,))
+
+    t = np.linspace(0, duration, num_samples, endpoint=endpoint, dtype=dtype)
+    two_pi_t = (2 * np.pi * t).astype(dtype)
+
+    # One output and one work buffer, reused for every tone
+    signals = np.zeros((num_signals, num_samples), dtype=dtype)
+    work = np.empty_like(signals)
+    for k in range(num_tones):
+        np.multiply(frequencies[:, k, np.newaxis], two_pi_t, out=work)
+        work += phases[:, k, np.newaxis]
+        np.sin(work, out=work)
+        work *= amplitudes[:, k, np.newaxis]
+        signals += work
+
+    if np.any(noise_std > 0):
+        rng = np.random.default_rng() if rng is None else rng
+        rng.standard_normal(out=work, dtype=dtype)
+        work *= noise_std[:, np.newaxis]
+        signals += work
+
+    return t, signals
+
+
+def generate_base_signal(num_samples=1000):
+    """Generate a base signal with constant amplitude (5 Hz plus its third harmonic)"""
+    t, signals = generate_signals([5, 15], [1.0, 0.3], num_samples=num_samples)
+    return t, signals[0]
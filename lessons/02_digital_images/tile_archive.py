@@ -0,0 +1,295 @@
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+import warnings
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compression_benchmark import HISTOLOGY_PATTERN
+from image_codecs import LOSSLESS_CODECS, codec_label, decode_image, encode_image
+from quality_metrics import psnr
+from tiled_image import DEFAULT_TILE_SIZE, TiledImage, load_source
+
+# (codec, quality) candidates tried on every tile
+DEFAULT_CANDIDATES = [
+    ('PNG', None),
+    ('TIFF_DEFLATE', None),
+    ('TIFF_ZSTD', None),
+    ('JPEG', 95),
+    ('JPEG', 90),
+    ('JPEG', 85),
+    ('JPEG', 75),
+    ('JPEG', 50),
+]
+
+# Smallest PSNR accepted for lossy tiles (None: lossless only)
+DEFAULT_MIN_PSNR = 45.0
+
+# Files inside an archive directory
+METADATA_FILE = 'archive.json'
+INDEX_FILE = 'index.npy'
+DATA_FILE = 'tiles.bin'
+
+# One index entry per tile: where its encoding is, which candidate, and its PSNR
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4'), ('candidate', '<u1'), ('psnr', '<f4')])
+
+
+def encode_tile(tile, candidates, min_psnr=DEFAULT_MIN_PSNR):
+    """
+    Encode one tile with every candidate and keep the smallest acceptable one
+
+    Runs in a worker process, so it only takes and returns picklable data.
+
+    Args:
+        tile: Tile pixels
+        candidates: List of (codec, quality) pairs
+        min_psnr: Smallest PSNR accepted for lossy codecs (None: lossless only)
+
+    Returns:
+        Tuple of (index of the chosen candidate, its encoding, encoded size
+        per candidate, PSNR per candidate); sizes of failed candidates are -1
+    """
+    sizes = np.full(len(candidates), -1, dtype=np.int64)
+    quality = np.full(len(candidates), -np.inf)
+    encodings = [None] * len(candidates)
+    lossy, decoded = [], []
+
+    for i, (codec, setting) in enumerate(candidates):
+        try:
+            encodings[i] = encode_image(tile, codec, setting)
+        except (OSError, ValueError, KeyError):
+            # e.g. JPEG cannot store 16-bit tiles, or zstd is not built in
+            continue
+        sizes[i] = len(encodings[i])
+        if codec in LOSSLESS_CODECS:
+            quality[i] = np.inf
+        else:
+            lossy.append(i)
+            decoded.append(decode_image(encodings[i]))
+    if lossy:
+        # All lossy versions of the tile are scored in one call
+        quality[lossy] = psnr(tile, decoded)
+
+    acceptable = (sizes >= 0) & ((quality == np.inf) if min_psnr is None else (quality >= min_psnr))
+    if not acceptable.any():
+        raise ValueError("no candidate codec could encode the tile within the constraint")
+    choice = int(np.flatnonzero(acceptable)[np.argmin(sizes[acceptable])])
+    return choice, encodings[choice], sizes, quality
+
+
+def write_archive(source, directory, candidates=DEFAULT_CANDIDATES, min_psnr=DEFAULT_MIN_PSNR,
+                  tile_size=DEFAULT_TILE_SIZE, workers=None):
+    """
+    Compress an image tile by tile, each tile with its best codec
+
+    Tiles are encoded in parallel worker processes. The chosen encodings
+    are concatenated into one data file, and an index of (offset, length,
+    candidate) per tile allows decoding any tile without touching the others.
+
+    Args:
+        source: Image path, .npy path or array
+        directory: Output directory (created if needed)
+        candidates: List of (codec, quality) pairs tried on every tile
+        min_psnr: Smallest PSNR accepted for lossy codecs (None: lossless only)
+        tile_size: Tile side in pixels
+        workers: Number of worker processes (default: number of CPUs)
+
+    Returns:
+        Tuple of (TileArchive opened on the directory, dictionary with the
+        encoded size and PSNR of every candidate for every tile, shaped
+        (tile rows, tile columns, candidates))
+    """
+    img = load_source(source)
+    height, width = img.shape[:2]
+    grid = (-(-height // tile_size), -(-width // tile_size))
+    positions = [(ty, tx) for ty in range(grid[0]) for tx in range(grid[1])]
+    tiles = (np.asarray(img[ty * tile_size:(ty + 1) * tile_size, tx * tile_size:(tx + 1) * tile_size])
+             for ty, tx in positions)
+
+    os.makedirs(directory, exist_ok=True)
+    index = np.zeros(grid, dtype=INDEX_DTYPE)
+    sizes = np.zeros(grid + (len(candidates),), dtype=np.int64)
+    quality = np.zeros(grid + (len(candidates),))
+
+    with open(os.path.join(directory, DATA_FILE), 'wb') as f, ProcessPoolExecutor(workers) as pool:
+        results = pool.map(encode_tile, tiles, [candidates] * len(positions),
+                           [min_psnr] * len(positions), chunksize=4)
+        # Results arrive in tile order, so the data file is written sequentially
+        for (ty, tx), (choice, data, tile_sizes, tile_quality) in zip(positions, results):
+            index[ty, tx] = (f.tell(), len(data), choice, tile_quality[choice])
+            f.write(data)
+            sizes[ty, tx], quality[ty, tx] = tile_sizes, tile_quality
+
+    np.save(os.path.join(directory, INDEX_FILE), index)
+    metadata = {
+        'shape': list(img.shape),
+        'dtype': np.dtype(img.dtype).str,
+        'tile_size': tile_size,
+        'candidates': [list(candidate) for candidate in candidates],
+        'min_psnr': min_psnr,
+        'source': str(source) if not isinstance(source, np.ndarray) else None,
+    }
+    with open(os.path.join(directory, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    return TileArchive(directory), {'sizes': sizes, 'psnr': quality}
+
+
+class TileArchive(TiledImage):
+    """
+    Tiled image compressed with a codec chosen per tile
+
+    Tiles are decoded on demand from one memory-mapped data file and kept
+    in an LRU cache; slicing works like TiledImage.
+
+    Args:
+        directory: Directory written by write_archive
+        cache_size: Number of decoded tiles kept in memory
+    """
+
+    def __init__(self, directory, cache_size=64):
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        self.directory = directory
+        self.shape = tuple(metadata['shape'])
+        self.dtype = np.dtype(metadata['dtype'])
+        self.tile_size = metadata['tile_size']
+        self.candidates = [tuple(candidate) for candidate in metadata['candidates']]
+        self.min_psnr = metadata['min_psnr']
+        self.index = np.load(os.path.join(directory, INDEX_FILE))
+        self.data = np.memmap(os.path.join(directory, DATA_FILE), dtype=np.uint8, mode='r')
+        self.grid = self.index.shape
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @property
+    def nbytes(self):
+        """Size of the encoded tiles"""
+        return int(self.index['length'].sum())
+
+    def read_tile(self, ty, tx):
+        """Decode one tile from the data file"""
+        entry = self.index[ty, tx]
+        offset = int(entry['offset'])
+        return decode_image(self.data[offset:offset + int(entry['length'])].tobytes())
+
+    def codec_counts(self):
+        """Number of tiles stored with every candidate"""
+        counts = Counter(self.index['candidate'].ravel().tolist())
+        return {codec_label(*self.candidates[i]): n for i, n in sorted(counts.items())}
+
+
+def decode_throughput(archive, repeats=3):
+    """
+    Decode every tile of an archive, bypassing the cache
+
+    Returns:
+        Best decoding speed in megabytes of pixels per second
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for ty in range(archive.grid[0]):
+            for tx in range(archive.grid[1]):
+                archive.read_tile(ty, tx)
+        best = min(best, time.perf_counter() - start)
+    return np.prod(archive.shape) * archive.dtype.itemsize / 1e6 / best
+
+
+def best_single_candidate(stats, min_psnr):
+    """
+    Candidate that meets the constraint on every tile with the smallest total
+
+    Args:
+        stats: Dictionary returned by write_archive
+        min_psnr: Smallest PSNR accepted (None: lossless only)
+
+    Returns:
+        Index of the candidate, or None if no single candidate qualifies
+    """
+    sizes, quality = stats['sizes'], stats['psnr']
+    valid = (sizes >= 0) & ((quality == np.inf) if min_psnr is None else (quality >= min_psnr))
+    everywhere = valid.all(axis=(0, 1))
+    if not everywhere.any():
+        return None
+    totals = np.where(everywhere, sizes.sum(axis=(0, 1)), np.iinfo(np.int64).max)
+    return int(np.argmin(totals))
+
+
+def compare_with_baseline(source, directory, candidates=DEFAULT_CANDIDATES, min_psnr=DEFAULT_MIN_PSNR,
+                          tile_size=DEFAULT_TILE_SIZE, workers=None):
+    """
+    Archive an image adaptively and with the best single codec, and compare them
+
+    Returns:
+        Dictionary with sizes, compression ratios, decode throughput,
+        encoding time and the codec mix of the adaptive archive
+    """
+    start = time.perf_counter()
+    archive, stats = write_archive(source, os.path.join(directory, 'adaptive'), candidates, min_psnr,
+                                   tile_size, workers)
+    encode_time = time.perf_counter() - start
+    raw_bytes = int(np.prod(archive.shape)) * archive.dtype.itemsize
+
+    report = {
+        'raw_bytes': raw_bytes,
+        'adaptive_bytes': archive.nbytes,
+        'adaptive_ratio': raw_bytes / archive.nbytes,
+        'adaptive_decode_mb_s': decode_throughput(archive),
+        'min_tile_psnr': float(archive.index['psnr'].min()),
+        'encode_s': encode_time,
+        'codec_counts': archive.codec_counts(),
+    }
+
+    single = best_single_candidate(stats, min_psnr)
+    if single is None:
+        warnings.warn("no single candidate meets the constraint on every tile")
+        return report
+    baseline, _ = write_archive(source, os.path.join(directory, 'baseline'), [candidates[single]],
+                                min_psnr, tile_size, workers)
+    report.update({
+        'baseline_codec': codec_label(*candidates[single]),
+        'baseline_bytes': baseline.nbytes,
+        'baseline_ratio': raw_bytes / baseline.nbytes,
+        'baseline_decode_mb_s': decode_throughput(baseline),
+    })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive slides with the best codec per tile')
+    parser.add_argument('images', nargs='*', help='Image files (default: the course histology slides)')
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--min-psnr', type=float, default=DEFAULT_MIN_PSNR,
+                        help='Smallest PSNR accepted for lossy tiles')
+    parser.add_argument('--lossless', action='store_true', help='Only accept lossless codecs')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--out-dir', help='Folder for the archives (default: a temporary folder)')
+    args = parser.parse_args()
+
+    min_psnr = None if args.lossless else args.min_psnr
+    paths = args.images or sorted(glob.glob(HISTOLOGY_PATTERN))
+    with tempfile.TemporaryDirectory() as scratch:
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0] + '.archive'
+            report = compare_with_baseline(path, os.path.join(args.out_dir or scratch, name),
+                                           min_psnr=min_psnr, tile_size=args.tile_size,
+                                           workers=args.workers)
+            print(f'{os.path.basename(path)}: {report["raw_bytes"] / 1e6:.1f} MB raw, '
+                  f'encoded in {report["encode_s"]:.1f} s')
+            print(f'  adaptive:       {report["adaptive_bytes"] / 1e6:6.2f} MB '
+                  f'({report["adaptive_ratio"]:5.1f}x), decode {report["adaptive_decode_mb_s"]:6.1f} MB/s, '
+                  f'worst tile {report["min_tile_psnr"]:.1f} dB')
+            if 'baseline_codec' in report:
+                print(f'  {report["baseline_codec"]:15s} {report["baseline_bytes"] / 1e6:6.2f} MB '
+                      f'({report["baseline_ratio"]:5.1f}x), decode {report["baseline_decode_mb_s"]:6.1f} MB/s')
+            print(f'  tiles per codec: {report["codec_counts"]}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+# Tile side in pixels used when converting slides
+DEFAULT_TILE_SIZE = 512
+
+# Files inside a tiled image directory
+METADATA_FILE = 'tiles.json'
+TILES_FILE = 'tiles.npy'
+
+
+def load_source(source):
+    """
+    Open the image to convert
+
+    Args:
+        source: Path to an image file (read with Pillow) or a .npy file, or an array
+
+    Returns:
+        Array-like image (a memmap for .npy files)
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if str(source).endswith('.npy'):
+        return np.load(source, mmap_mode='r')
+    with Image.open(source) as img:
+        return np.asarray(img)
+
+
+def convert_to_tiles(source, directory, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Convert an image once into a chunked on-disk tile store
+
+    Tiles are stored in a single .npy file with shape
+    (tile rows, tile columns, tile_size, tile_size[, channels]), so every tile
+    is contiguous on disk and can be read through a memory map without
+    decoding anything else. Edge tiles are zero padded.
+
+    Args:
+        source: Image path, .npy path or array
+        directory: Output directory (created if needed)
+        tile_size: Tile side in pixels
+
+    Returns:
+        TiledImage opened on the new directory
+    """
+    img = load_source(source)
+    height, width = img.shape[:2]
+    channels = img.shape[2:]
+    grid = (-(-height // tile_size), -(-width // tile_size))
+
+    os.makedirs(directory, exist_ok=True)
+    tiles = np.lib.format.open_memmap(os.path.join(directory, TILES_FILE), mode='w+',
+                                      dtype=img.dtype, shape=grid + (tile_size, tile_size) + channels)
+
+    # Copy one row of tiles at a time to keep memory bounded
+    for ty in range(grid[0]):
+        rows = np.asarray(img[ty * tile_size:(ty + 1) * tile_size])
+        for tx in range(grid[1]):
+            block = rows[:, tx * tile_size:(tx + 1) * tile_size]
+            tiles[ty, tx] = 0
+            tiles[ty, tx, :block.shape[0], :block.shape[1]] = block
+    tiles.flush()
+    del tiles
+
+    metadata = {
+        'shape': list(img.shape),
+        'dtype': np.dtype(img.dtype).str,
+        'tile_size': tile_size,
+        'source': str(source) if not isinstance(source, np.ndarray) else None,
+    }
+    with open(os.path.join(directory, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    return TiledImage(directory)
+
+
+class TiledImage:
+    """
+    Memory-mapped tiled image with an LRU cache of recently used tiles
+
+    Regions are assembled from the tiles they overlap, so only those tiles are
+    read from disk. Supports numpy-style 2D slicing: slide[y0:y1, x0:x1].
+
+    Args:
+        directory: Directory written by convert_to_tiles
+        cache_size: Number of tiles kept in memory
+    """
+
+    def __init__(self, directory, cache_size=64):
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            metadata = json.load(f)
+        self.directory = directory
+        self.shape = tuple(metadata['shape'])
+        self.dtype = np.dtype(metadata['dtype'])
+        self.tile_size = metadata['tile_size']
+        self.tiles = np.load(os.path.join(directory, TILES_FILE), mmap_mode='r')
+        self.grid = self.tiles.shape[:2]
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def tile(self, ty, tx):
+        """
+        Read one tile (cropped at the image border)
+
+        Args:
+            ty, tx: Tile row and column
+
+        Returns:
+            Read-only array with the tile pixels
+        """
+        key = (ty, tx)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        tile = self.read_tile(ty, tx)
+        tile.flags.writeable = False
+
+        self._cache[key] = tile
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tile
+
+    def read_tile(self, ty, tx):
+        """Read one tile from disk, bypassing the cache (override for other storage)"""
+        height = min(self.tile_size, self.shape[0] - ty * self.tile_size)
+        width = min(self.tile_size, self.shape[1] - tx * self.tile_size)
+        return np.array(self.tiles[ty, tx, :height, :width])
+
+    def read_region(self, y, x, height, width):
+        """
+        Read a rectangular region, touching only the tiles it overlaps
+
+        Args:
+            y, x: Top-left corner in pixels
+            height, width: Size of the region in pixels
+
+        Returns:
+            New array with the region pixels
+        """
+        y_end, x_end = min(y + height, self.shape[0]), min(x + width, self.shape[1])
+        y, x = max(y, 0), max(x, 0)
+        region = np.empty((max(y_end - y, 0), max(x_end - x, 0)) + self.shape[2:], self.dtype)
+
+        size = self.tile_size
+        for ty in range(y // size, -(-y_end // size)):
+            for tx in range(x // size, -(-x_end // size)):
+                tile = self.tile(ty, tx)
+                # Overlap of the tile with the region, in image coordinates
+                y0, y1 = max(y, ty * size), min(y_end, (ty + 1) * size)
+                x0, x1 = max(x, tx * size), min(x_end, (tx + 1) * size)
+                region[y0 - y:y1 - y, x0 - x:x1 - x] = \
+                    tile[y0 - ty * size:y1 - ty * size, x0 - tx * size:x1 - tx * size]
+        return region
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows, cols = (tuple(key) + (slice(None),) * 2)[:2]
+        if not isinstance(rows, slice) or not isinstance(cols, slice):
+            raise TypeError("TiledImage only supports slice indexing, e.g. img[0:512, 0:512]")
+
+        y0, y1, y_step = rows.indices(self.shape[0])
+        x0, x1, x_step = cols.indices(self.shape[1])
+        if y_step < 0 or x_step < 0:
+            raise ValueError("negative slice steps are not supported")
+        region = self.read_region(y0, x0, y1 - y0, x1 - x0)
+        return region[::y_step, ::x_step][(slice(None), slice(None)) + key[2:]]
+
+    def iter_tiles(self):
+        """
+        Iterate over all tiles in row-major order
+
+        Yields:
+            Tuple of (y, x, tile) with the top-left pixel of each tile
+        """
+        for ty in range(self.grid[0]):
+            for tx in range(self.grid[1]):
+                yield ty * self.tile_size, tx * self.tile_size, self.tile(ty, tx)
+
+    def read(self):
+        """Read the whole image into memory (only for small images)"""
+        return self.read_region(0, 0, *self.shape[:2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert slides into memory-mapped tile stores')
+    parser.add_argument('images', nargs='+', help='Image files to convert')
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--out-dir', help='Folder for the tile stores (default: next to each image)')
+    args = parser.parse_args()
+
+    for path in args.images:
+        name = os.path.splitext(os.path.basename(path))[0] + '.tiles'
+        directory = os.path.join(args.out_dir or os.path.dirname(path), name)
+        slide = convert_to_tiles(path, directory, args.tile_size)
+        print(f'{path} -> {directory} ({slide.grid[0]}x{slide.grid[1]} tiles)')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import numpy as np
+import matplotlib as mpl
+
+# Traces shorter than this many points per pixel column are drawn as they are
+POINTS_PER_PIXEL = 2
+
+
+def axis_pixel_width(ax, dpi=None):
+    """
+    Width of an axis in output pixels
+
+    Args:
+        ax: Matplotlib axis
+        dpi: Output resolution (default: savefig.dpi if set, else the figure DPI)
+
+    Returns:
+        Number of pixel columns the axis covers
+    """
+    if dpi is None:
+        dpi = mpl.rcParams['savefig.dpi']
+        if dpi == 'figure':
+            dpi = ax.figure.dpi
+    width_inches = ax.get_position().width * ax.figure.get_figwidth()
+    return max(int(np.ceil(width_inches * dpi)), 1)
+
+
+def run_edges(mask):
+    """
+    Indices on both sides of every change in a boolean mask
+
+    Keeping these samples makes the start and end of every run (e.g. a
+    saturated plateau) exact after decimation.
+
+    Returns:
+        Sorted array of sample indices
+    """
+    changes = np.flatnonzero(np.diff(np.asarray(mask, dtype=np.int8)))
+    return np.union1d(changes, changes + 1)
+
+
+def minmax_indices(y, num_bins, keep=None):
+    """
+    Sample indices of the minimum and maximum of each bin (M4-style decimation)
+
+    The samples are split into num_bins bins of equal length. Taking the
+    first occurrence of each extreme means a bin with a single quantization
+    step keeps the exact sample where the step happens, and a flat plateau
+    keeps its first sample.
+
+    Args:
+        y: 1D trace
+        num_bins: Number of bins (normally one per pixel column)
+        keep: Extra indices that must survive, e.g. from run_edges
+
+    Returns:
+        Sorted array of unique indices (at most 2 * num_bins plus keep)
+    """
+    y = np.asarray(y)
+    n = y.size
+    bin_size = -(-n // num_bins)
+    full = n - n % bin_size
+    parts = [[0, n - 1]]
+
+    # Bins of equal length as rows of a reshaped view, plus a shorter last bin
+    blocks = y[:full].reshape(-1, bin_size)
+    offsets = np.arange(blocks.shape[0]) * bin_size
+    parts += [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    if full < n:
+        tail = y[full:]
+        parts.append([full + tail.argmin(), full + tail.argmax()])
+
+    if keep is not None:
+        parts.append(np.asarray(keep, dtype=np.int64))
+    return np.unique(np.concatenate([np.asarray(p, dtype=np.int64) for p in parts]))
+
+
+def decimate(ax, x, *ys, keep=None, dpi=None):
+    """
+    Reduce traces to about POINTS_PER_PIXEL points per pixel column of an axis
+
+    Short traces are returned unchanged, so figures of ordinary signals look
+    exactly as before. For several traces (e.g. both edges of a filled band)
+    the union of their extremes is kept, so they stay on the same x values.
+
+    Args:
+        ax: Axis the traces will be drawn on
+        x: Sample positions (increasing, roughly uniform)
+        ys: One or more traces of the same length as x (scalars are passed through)
+        keep: Extra indices that must survive
+        dpi: Output resolution used to size the bins
+
+    Returns:
+        Tuple of (x, *ys) restricted to the kept samples
+    """
+    x = np.asarray(x)
+    num_bins = axis_pixel_width(ax, dpi)
+    if x.size <= POINTS_PER_PIXEL * num_bins:
+        return (x,) + ys
+
+    arrays = [y for y in ys if np.ndim(y) > 0]
+    index = np.unique(np.concatenate([minmax_indices(y, num_bins, keep) for y in arrays]))
+    return (x[index],) + tuple(y[index] if np.ndim(y) > 0 else y for y in ys)
+
+
+def plot_trace(ax, x, y, *args, keep=None, dpi=None, **kwargs):
+    """ax.plot of a long trace, decimated to the axis resolution"""
+    x, y = decimate(ax, x, y, keep=keep, dpi=dpi)
+    return ax.plot(x, y, *args, **kwargs)
+
+
+def step_trace(ax, x, y, *args, keep=None, dpi=None, **kwargs):
+    """ax.step of a long trace, decimated to the axis resolution"""
+    x, y = decimate(ax, x, y, keep=keep, dpi=dpi)
+    return ax.step(x, y, *args, **kwargs)
+
+
+def fill_between_trace(ax, x, y1, y2=0, keep=None, dpi=None, **kwargs):
+    """ax.fill_between of long traces, decimated to the axis resolution"""
+    x, y1, y2 = decimate(ax, x, y1, y2, keep=keep, dpi=dpi)
+    return ax.fill_between(x, y1, y2, **kwargs)
+
+
+def stem_trace(ax, x, y, *args, keep=None, dpi=None, **kwargs):
+    """ax.stem of a long trace, keeping the tallest stems of every pixel column"""
+    x, y = decimate(ax, x, y, keep=keep, dpi=dpi)
+    return ax.stem(x, y, *args, **kwargs)
@@ -1,60 +1,43 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from adc import quantize, dequantize
+from signal_bank import generate_base_signal
+from trace_plot import plot_trace, step_trace
+
 def analog_to_digital_with_quantization(signal, bit_depth, input_range):
     """
     Convert an analog signal to digital with quantization visualization
     
     Args:
-        signal: The original analog signal
-        bit_depth: Number of bits to use for quantization
+        signal: The original analog signal, or a (channels, samples) block
+        bit_depth: Number of bits to use for quantization (or one per channel)
         input_range: Tuple of (min, max) representing ADC input range
+            (or a (channels, 2) array of per-channel ranges)
     
     Returns:
-        Tuple of (digital signal, utilized levels, total levels)
+        Tuple of (digital signal, utilized levels, total levels), with levels
+        per channel for a multi-channel block
     """
     # Calculate number of quantization levels
-    total_levels = 2**bit_depth
-    
-    # Get input range limits
-    min_range, max_range = input_range
-    
-    # Clip signal to the ADC input range (saturation/clipping)
-    saturated_signal = np.clip(signal, min_range, max_range)
-    
-    # Normalize to [0, 1] for quantization
-    normalized = (saturated_signal - min_range) / (max_range - min_range)
-    
-    # Calculate the raw quantization levels (before rounding)
-    raw_levels = normalized * (total_levels - 1)
-    
-    # Quantize to specified bit depth
-    quantized_levels = np.round(raw_levels)
-    quantized = quantized_levels / (total_levels - 1)
+    total_levels = 2**np.asarray(bit_depth)
     
-    # Calculate how many unique levels are actually used
-    utilized_levels = len(np.unique(quantized_levels))
+    # Clip to the ADC input range and quantize, counting the levels actually used
+    codes, _, utilized_levels = quantize(signal, bit_depth, input_range)
+    if np.ndim(utilized_levels) == 0 and total_levels.ndim == 0:
+        utilized_levels, total_levels = int(utilized_levels), int(total_levels)
     
     # Scale back to original range
-    digital_signal = quantized * (max_range - min_range) + min_range
+    digital_signal = dequantize(codes, bit_depth, input_range)
     
     return digital_signal, utilized_levels, total_levels
 
-def generate_base_signal(num_samples=1000):
-    """Generate a moderate-amplitude base signal"""
-    t = np.linspace(0, 1, num_samples)
+def visualize_under_amplification(num_samples=1000):
+    # Generate our base signal (long signals are decimated to the screen resolution)
+    t, base_signal = generate_base_signal(num_samples)
     
-    # Base frequency
-    freq = 5
-    
-    # Create a sinusoidal signal with some harmonics for interest
-    signal = np.sin(2 * np.pi * freq * t) + 0.3 * np.sin(2 * np.pi * freq * 3 * t)
-    
-    return t, signal
-
-def visualize_under_amplification():
-    # Generate our base signal
-    t, base_signal = generate_base_signal()
+    # Region shown in the zoom inset
+    zoom = slice(int(0.40 * num_samples), int(0.45 * num_samples))
     
     # Set up the figure
     fig, axs = plt.subplots(3, 1, figsize=(12, 10), sharex=True)
@@ -93,10 +76,10 @@ def visualize_under_amplification():
         lost_resolution = bit_depth - effective_bits
         
         # Plot the original analog signal
-        axs[i].plot(t, analog_signal, 'blue', alpha=0.4, label='Analog Signal')
+        plot_trace(axs[i], t, analog_signal, 'blue', alpha=0.4, label='Analog Signal')
         
         # Plot the digital signal
-        axs[i].step(t, digital_signal, 'green', where='post', 
+        step_trace(axs[i], t, digital_signal, 'green', where='post', 
                    linewidth=1.2, label=f'Digital Signal ({bit_depth}-bit ADC)')
         
         # Plot the ADC input range
@@ -149,8 +132,8 @@ def visualize_under_amplification():
             
             # Create the zoomed inset
             zoom_ax = zoomed_inset_axes(axs[i], 6, loc='center right', bbox_to_anchor=(0.98, 0.5), bbox_transform=axs[i].transAxes)
-            zoom_ax.plot(t[400:450], analog_signal[400:450], 'blue', alpha=0.4)
-            zoom_ax.step(t[400:450], digital_signal[400:450], 'green', where='post', linewidth=1.5)
+            plot_trace(zoom_ax, t[zoom], analog_signal[zoom], 'blue', alpha=0.4)
+            step_trace(zoom_ax, t[zoom], digital_signal[zoom], 'green', where='post', linewidth=1.5)
             
             # Show the quantization levels in the zoomed region
             for level in range(level_start, level_start + num_levels_to_show):
@@ -160,9 +143,9 @@ def visualize_under_amplification():
                                   alpha=0.3, linewidth=0.5)
             
             # Set the limits for the zoomed region
-            y_center = np.mean(analog_signal[400:450])
+            y_center = np.mean(analog_signal[zoom])
             y_range = 0.1
-            zoom_ax.set_xlim(t[400], t[450])
+            zoom_ax.set_xlim(t[zoom.start], t[zoom.stop])
             zoom_ax.set_ylim(y_center - y_range/2, y_center + y_range/2)
             zoom_ax.grid(True, alpha=0.3)
             
@@ -178,7 +161,9 @@ def visualize_under_amplification():
     plt.subplots_adjust(top=0.92, bottom=0.08)
     
     # plt.savefig('under_amplification_visualization.png', dpi=300)
-    plt.show()
+    
+    return fig
 
 if __name__ == "__main__":
     visualize_under_amplification()
+    plt.show()